@@ -188,12 +188,18 @@ class DevOpsAgent(ToolCallingAgent):
                     # If we can't find the tool, raise error as fallback
                     raise ValueError(rejection_message)
 
-        # Create a signature for this tool call (tool name + arguments)
-        import json
-        current_call_signature = json.dumps({"tool": tool_name, "args": arguments}, sort_keys=True)
+        # Create a hashable key for this tool call (tool name + sorted arguments)
+        # Cheaper than serializing the arguments to JSON on every call.
+        # Models sometimes emit "arguments" as a raw string instead of an
+        # object; the base class executes those fine, so key on the raw
+        # value rather than crashing on .items()
+        if isinstance(arguments, dict):
+            current_call_key = (tool_name, tuple(sorted(arguments.items())))
+        else:
+            current_call_key = (tool_name, arguments)
 
         # Check for repetition (calling the same tool with same parameters twice in a row)
-        if self.last_tool_call == current_call_signature and tool_name != "final_answer":
+        if self.last_tool_call == current_call_key and tool_name != "final_answer":
             raise ValueError(
                 f"REPETITION DETECTED: You just called '{tool_name}' with the exact same parameters. "
                 f"You already received the result from this command. Do not repeat the same tool call! "
@@ -203,7 +209,7 @@ class DevOpsAgent(ToolCallingAgent):
 
         # Update last tool call (but not for final_answer, as it doesn't produce data)
         if tool_name != "final_answer":
-            self.last_tool_call = current_call_signature
+            self.last_tool_call = current_call_key
 
         # Check if this is a final_answer call without prior tool executions
         if tool_name == "final_answer":
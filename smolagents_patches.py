@@ -25,7 +25,22 @@ ToolCallingAgent._make_system_message = _minimal_system_message
 # ─────────────────────────────────────────────
 _original_to_messages = ActionStep.to_messages
 
-def _qwen_friendly_to_messages(self, summary_mode=False):
+# Enum attribute lookups go through EnumMeta.__getattr__ on every access;
+# hoist the roles once at import time since they are constants.
+_ASSISTANT = MessageRole.ASSISTANT
+_TOOL_RESPONSE = MessageRole.TOOL_RESPONSE
+
+
+def _tool_response(text):
+    """Build a tool-response ChatMessage with the content shape QWEN expects."""
+    return ChatMessage(role=_TOOL_RESPONSE, content=[{"type": "text", "text": text}])
+
+def _qwen_friendly_to_messages(self, summary_mode=False,
+                               # Default-arg binding: LOAD_FAST instead of
+                               # LOAD_GLOBAL on the per-step serialization path
+                               ChatMessage=ChatMessage,
+                               _ASSISTANT=_ASSISTANT,
+                               _tool_response=_tool_response):
     """
     Override tool response formatting to be more explicit for small models.
     Instead of generic 'Observation: value', format as:
@@ -40,7 +55,7 @@ def _qwen_friendly_to_messages(self, summary_mode=False):
         content = self.model_output if isinstance(self.model_output, str) else str(self.model_output)
         messages.append(
             ChatMessage(
-                role=MessageRole.ASSISTANT,
+                role=_ASSISTANT,
                 content=content.strip(),
             )
         )
@@ -63,17 +78,7 @@ def _qwen_friendly_to_messages(self, summary_mode=False):
             # Simpler, clearer format for small models
             formatted_observation = f"The value is: {observation_text}"
 
-        messages.append(
-            ChatMessage(
-                role=MessageRole.TOOL_RESPONSE,
-                content=[
-                    {
-                        "type": "text",
-                        "text": formatted_observation,
-                    }
-                ],
-            )
-        )
+        messages.append(_tool_response(formatted_observation))
 
     # Add error message if present
     if self.error is not None:
@@ -84,9 +89,7 @@ def _qwen_friendly_to_messages(self, summary_mode=False):
         )
         message_content = f"Call id: {self.tool_calls[0].id}\n" if self.tool_calls else ""
         message_content += error_message
-        messages.append(
-            ChatMessage(role=MessageRole.TOOL_RESPONSE, content=[{"type": "text", "text": message_content}])
-        )
+        messages.append(_tool_response(message_content))
 
     return messages
 
@@ -100,7 +103,24 @@ from rich.rule import Rule
 
 _original_print = Console.print
 
-def _filtered_print(self, *args, **kwargs):
+# Trivial one-character lines SmolAgents prints between steps
+_TRIVIAL_LINES = frozenset({'1', '2'})
+
+# Combined needle patterns so each printed string is scanned once instead of
+# once per marker (re compiles the alternation into a single automaton)
+_STEP_RE = re.compile(r"Step \d+")
+# The Step alternative stays anchored to the first line (\A[^\n]*), like
+# the re.match it replaced — a multi-line print merely mentioning
+# "Step 2" in its body must not be swallowed
+_SKIP_LINE_RE = re.compile(
+    r"\A[^\n]*Step \d+|Output message of the LLM:|Final answer:")
+_SKIP_PANEL_RE = re.compile(r"Output message of the LLM:|<tool_call>")
+
+def _filtered_print(self, *args,
+                    # Default-arg binding: keeps the per-print lookups local
+                    Rule=Rule, Panel=Panel, Text=Text,
+                    _SKIP_LINE_RE=_SKIP_LINE_RE, _SKIP_PANEL_RE=_SKIP_PANEL_RE,
+                    **kwargs):
     """Filter SmolAgents output in real-time"""
     # Skip filtering if verbose mode
     if os.getenv('VERBOSE') == '1':
@@ -113,27 +133,26 @@ def _filtered_print(self, *args, **kwargs):
         # Filter out Rich Rule objects (step separators like ━━━━━━)
         if isinstance(first_arg, Rule):
             # Check if it's a step separator
-            rule_text = str(first_arg.title) if hasattr(first_arg, 'title') else ""
-            if re.match(r'.*Step \d+.*', rule_text):
+            # Rule always has .title (may be None)
+            rule_text = str(first_arg.title or '')
+            if _STEP_RE.search(rule_text):
                 return  # Skip step separator rules
 
         # Filter out step headers and model output
         if isinstance(first_arg, str):
-            # Skip step separators, model output headers, duration lines
+            # Skip step separators, model output headers, duration lines,
+            # and the duplicate "Final answer:" line — one pass over the string
             stripped = first_arg.strip()
-            if (re.match(r'^.*Step \d+.*$', first_arg) or
-                'Output message of the LLM:' in first_arg or
-                re.match(r'^\[Step \d+:.*\]$', first_arg) or
-                'Final answer:' in first_arg or  # Skip duplicate "Final answer:" line
-                stripped in ['1', '2']):
+            if (_SKIP_LINE_RE.search(first_arg) or
+                (len(stripped) == 1 and stripped in _TRIVIAL_LINES)):
                 return  # Skip entirely
 
         # Handle Panel objects (tool calls, observations)
-        if isinstance(first_arg, Panel) and hasattr(first_arg, 'renderable'):
+        if isinstance(first_arg, Panel):  # Panel always has .renderable
             text_str = str(first_arg.renderable)
 
             # Skip model output panels
-            if 'Output message of the LLM:' in text_str or '<tool_call>' in text_str:
+            if _SKIP_PANEL_RE.search(text_str):
                 return
 
             # Reformat tool call panels to be compact
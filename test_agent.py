@@ -10,6 +10,12 @@ from unittest.mock import Mock, patch, MagicMock
 from agent import read_file, write_file, bash, get_env, DevOpsAgent
 
 
+@pytest.fixture(scope='module')
+def shared_tmp(tmp_path_factory):
+    """One temp dir shared by tests that don't need per-test isolation."""
+    return tmp_path_factory.mktemp('shared')
+
+
 class TestTools:
     """Test individual tool functions"""
 
@@ -30,20 +36,19 @@ class TestTools:
         with pytest.raises(FileNotFoundError):
             read_file("/nonexistent/file.txt")
 
-    def test_write_file_success(self):
+    def test_write_file_success(self, shared_tmp):
         """Test writing to a file"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            filepath = os.path.join(tmpdir, "test.txt")
-            content = "Hello World"
+        filepath = str(shared_tmp / "test_write_file_success.txt")
+        content = "Hello World"
 
-            result = write_file(filepath, content)
-            assert "wrote" in result.lower()
-            assert "bytes" in result.lower()
+        result = write_file(filepath, content)
+        assert "wrote" in result.lower()
+        assert "bytes" in result.lower()
 
-            # Verify file was created
-            assert os.path.exists(filepath)
-            with open(filepath, 'r') as f:
-                assert f.read() == content
+        # Verify file was created
+        assert os.path.exists(filepath)
+        with open(filepath, 'r') as f:
+            assert f.read() == content
 
     def test_write_file_invalid_path(self):
         """Test writing to invalid path raises exception"""
@@ -96,146 +101,73 @@ class TestTools:
         assert 'not set' in result.lower() or 'error' in result.lower()
 
 
+@pytest.fixture
+def agent_factory(monkeypatch):
+    """Build a DevOpsAgent with env overrides applied and the backend mocked."""
+    def _make(**env):
+        for key, value in env.items():
+            if value is None:
+                monkeypatch.delenv(key, raising=False)
+            else:
+                monkeypatch.setenv(key, value)
+        with patch('agent.OllamaChat'):
+            return DevOpsAgent(
+                tools=[read_file, write_file, bash, get_env],
+                model=Mock(),
+                instructions="Test instructions"
+            )
+    return _make
+
+
 class TestDevOpsAgent:
     """Test DevOpsAgent class functionality"""
 
-    @patch('agent.OllamaChat')
-    def test_agent_initialization(self, mock_ollama):
+    def test_agent_initialization(self, agent_factory):
         """Test agent can be initialized"""
-        mock_model = Mock()
-        mock_ollama.return_value = mock_model
-
-        agent = DevOpsAgent(
-            tools=[read_file, write_file, bash, get_env],
-            model=mock_model,
-            instructions="Test instructions"
-        )
+        agent = agent_factory()
 
         assert agent is not None
         # Agent has 5 tools: 4 provided + final_answer
         assert len(agent.tools) == 5
         assert 'final_answer' in agent.tools
 
-    @patch('agent.OllamaChat')
-    def test_agent_verbose_mode(self, mock_ollama):
+    def test_agent_verbose_mode(self, agent_factory):
         """Test verbose mode can be enabled"""
-        os.environ['VERBOSE'] = '1'
-        mock_model = Mock()
-        mock_ollama.return_value = mock_model
+        agent = agent_factory(VERBOSE='1')
+        assert agent.verbose == True
 
-        agent = DevOpsAgent(
-            tools=[read_file, write_file, bash, get_env],
-            model=mock_model,
-            instructions="Test instructions"
-        )
+    @pytest.mark.parametrize("env_value,expected", [
+        (None, True),   # enabled by default
+        ('0', False),   # disabled with REQUIRE_APPROVAL=0
+        ('1', True),    # explicitly enabled
+    ])
+    def test_agent_approval_mode(self, agent_factory, env_value, expected):
+        """Test approval mode default, disable, and explicit enable"""
+        agent = agent_factory(REQUIRE_APPROVAL=env_value)
+        assert agent.require_approval == expected
 
-        assert agent.verbose == True
-        del os.environ['VERBOSE']
-
-    @patch('agent.OllamaChat')
-    def test_agent_approval_mode_enabled_by_default(self, mock_ollama):
-        """Test approval mode is enabled by default"""
-        # Remove REQUIRE_APPROVAL if set
-        if 'REQUIRE_APPROVAL' in os.environ:
-            del os.environ['REQUIRE_APPROVAL']
-
-        mock_model = Mock()
-        mock_ollama.return_value = mock_model
-
-        agent = DevOpsAgent(
-            tools=[read_file, write_file, bash, get_env],
-            model=mock_model,
-            instructions="Test instructions"
-        )
-
-        # Should be enabled by default
-        assert agent.require_approval == True
-
-    @patch('agent.OllamaChat')
-    def test_agent_approval_mode_can_be_disabled(self, mock_ollama):
-        """Test approval mode can be disabled with REQUIRE_APPROVAL=0"""
-        os.environ['REQUIRE_APPROVAL'] = '0'
-        mock_model = Mock()
-        mock_ollama.return_value = mock_model
-
-        agent = DevOpsAgent(
-            tools=[read_file, write_file, bash, get_env],
-            model=mock_model,
-            instructions="Test instructions"
-        )
-
-        assert agent.require_approval == False
-        del os.environ['REQUIRE_APPROVAL']
-
-    @patch('agent.OllamaChat')
-    def test_agent_approval_mode_explicit_enable(self, mock_ollama):
-        """Test approval mode can be explicitly enabled"""
-        os.environ['REQUIRE_APPROVAL'] = '1'
-        mock_model = Mock()
-        mock_ollama.return_value = mock_model
-
-        agent = DevOpsAgent(
-            tools=[read_file, write_file, bash, get_env],
-            model=mock_model,
-            instructions="Test instructions"
-        )
-
-        assert agent.require_approval == True
-        del os.environ['REQUIRE_APPROVAL']
-
-    @patch('agent.OllamaChat')
     @patch('builtins.input', return_value='y')
-    def test_agent_approval_accepted(self, mock_input, mock_ollama):
+    def test_agent_approval_accepted(self, mock_input, agent_factory):
         """Test tool call approval when user accepts"""
-        os.environ['REQUIRE_APPROVAL'] = '1'
-        mock_model = Mock()
-        mock_ollama.return_value = mock_model
-
-        agent = DevOpsAgent(
-            tools=[read_file, write_file, bash, get_env],
-            model=mock_model,
-            instructions="Test instructions"
-        )
+        agent = agent_factory(REQUIRE_APPROVAL='1')
 
         approved, comment = agent.ask_user_approval("bash", {"command": "ls"})
         assert approved == True
         assert comment == ""
 
-        del os.environ['REQUIRE_APPROVAL']
-
-    @patch('agent.OllamaChat')
     @patch('builtins.input', side_effect=['n', 'test feedback'])
-    def test_agent_approval_rejected(self, mock_input, mock_ollama):
+    def test_agent_approval_rejected(self, mock_input, agent_factory):
         """Test tool call approval when user rejects"""
-        os.environ['REQUIRE_APPROVAL'] = '1'
-        mock_model = Mock()
-        mock_ollama.return_value = mock_model
-
-        agent = DevOpsAgent(
-            tools=[read_file, write_file, bash, get_env],
-            model=mock_model,
-            instructions="Test instructions"
-        )
+        agent = agent_factory(REQUIRE_APPROVAL='1')
 
         approved, comment = agent.ask_user_approval("bash", {"command": "rm -rf /"})
         assert approved == False
         assert "test feedback" in comment
 
-        del os.environ['REQUIRE_APPROVAL']
-
-    @patch('agent.OllamaChat')
     @patch('builtins.input', return_value='y')
-    def test_execute_tool_call_with_approval_accepted(self, mock_input, mock_ollama):
+    def test_execute_tool_call_with_approval_accepted(self, mock_input, agent_factory):
         """Test execute_tool_call with approval enabled and user accepts"""
-        os.environ['REQUIRE_APPROVAL'] = '1'
-        mock_model = Mock()
-        mock_ollama.return_value = mock_model
-
-        agent = DevOpsAgent(
-            tools=[read_file, write_file, bash, get_env],
-            model=mock_model,
-            instructions="Test instructions"
-        )
+        agent = agent_factory(REQUIRE_APPROVAL='1')
 
         # Create a test file
         with tempfile.NamedTemporaryFile(mode='w', delete=False) as f:
@@ -251,21 +183,11 @@ class TestDevOpsAgent:
             assert "test content" in result
         finally:
             os.unlink(temp_path)
-            del os.environ['REQUIRE_APPROVAL']
 
-    @patch('agent.OllamaChat')
     @patch('builtins.input', side_effect=['n', 'Too dangerous'])
-    def test_execute_tool_call_with_approval_rejected(self, mock_input, mock_ollama):
+    def test_execute_tool_call_with_approval_rejected(self, mock_input, agent_factory):
         """Test execute_tool_call with approval enabled and user rejects"""
-        os.environ['REQUIRE_APPROVAL'] = '1'
-        mock_model = Mock()
-        mock_ollama.return_value = mock_model
-
-        agent = DevOpsAgent(
-            tools=[read_file, write_file, bash, get_env],
-            model=mock_model,
-            instructions="Test instructions"
-        )
+        agent = agent_factory(REQUIRE_APPROVAL='1')
 
         # Execute tool call with approval enabled, user will reject
         result = agent.execute_tool_call("bash", {"command": "rm -rf /"})
@@ -274,21 +196,10 @@ class TestDevOpsAgent:
         assert "User rejected this tool call" in result
         assert "Too dangerous" in result
 
-        del os.environ['REQUIRE_APPROVAL']
-
-    @patch('agent.OllamaChat')
     @patch('builtins.input', side_effect=['n', ''])
-    def test_execute_tool_call_with_approval_rejected_no_comment(self, mock_input, mock_ollama):
+    def test_execute_tool_call_with_approval_rejected_no_comment(self, mock_input, agent_factory):
         """Test execute_tool_call rejection without user comment"""
-        os.environ['REQUIRE_APPROVAL'] = '1'
-        mock_model = Mock()
-        mock_ollama.return_value = mock_model
-
-        agent = DevOpsAgent(
-            tools=[read_file, write_file, bash, get_env],
-            model=mock_model,
-            instructions="Test instructions"
-        )
+        agent = agent_factory(REQUIRE_APPROVAL='1')
 
         # Execute tool call with approval enabled, user rejects without comment
         result = agent.execute_tool_call("bash", {"command": "dangerous_command"})
@@ -298,21 +209,10 @@ class TestDevOpsAgent:
         # Should not have "User comment:" since no comment was provided
         assert result == "User rejected this tool call."
 
-        del os.environ['REQUIRE_APPROVAL']
-
-    @patch('agent.OllamaChat')
     @patch('builtins.input', return_value='y')
-    def test_execute_tool_call_approval_skipped_for_final_answer(self, mock_input, mock_ollama):
+    def test_execute_tool_call_approval_skipped_for_final_answer(self, mock_input, agent_factory):
         """Test that approval is skipped for final_answer tool"""
-        os.environ['REQUIRE_APPROVAL'] = '1'
-        mock_model = Mock()
-        mock_ollama.return_value = mock_model
-
-        agent = DevOpsAgent(
-            tools=[read_file, write_file, bash, get_env],
-            model=mock_model,
-            instructions="Test instructions"
-        )
+        agent = agent_factory(REQUIRE_APPROVAL='1')
 
         # Create fake memory with tool calls to avoid hallucination detection
         class FakeStep:
@@ -341,74 +241,47 @@ class TestDevOpsAgent:
         # mock_input should not have been called for final_answer
         assert mock_input.call_count == 0
 
-        del os.environ['REQUIRE_APPROVAL']
-
-    @patch('agent.OllamaChat')
-    def test_agent_repetition_detection(self, mock_ollama):
+    def test_agent_repetition_detection(self, agent_factory, shared_tmp):
         """Test that agent detects repeated tool calls"""
-        os.environ['REQUIRE_APPROVAL'] = '0'  # Disable approval for easier testing
-        mock_model = Mock()
-        mock_ollama.return_value = mock_model
+        # Disable approval for easier testing
+        agent = agent_factory(REQUIRE_APPROVAL='0')
 
-        agent = DevOpsAgent(
-            tools=[read_file, write_file, bash, get_env],
-            model=mock_model,
-            instructions="Test instructions"
-        )
-
-        # First call should succeed
-        with tempfile.NamedTemporaryFile(mode='w', delete=False) as f:
+        temp_path = str(shared_tmp / "repetition_detection.txt")
+        with open(temp_path, 'w') as f:
             f.write("test")
-            temp_path = f.name
 
-        try:
-            # First call
-            result1 = agent.execute_tool_call("read_file", {"path": temp_path})
-            assert result1 is not None
+        # First call should succeed
+        result1 = agent.execute_tool_call("read_file", {"path": temp_path})
+        assert result1 is not None
 
-            # Second call with same parameters should raise ValueError
-            with pytest.raises(ValueError, match="REPETITION DETECTED"):
-                agent.execute_tool_call("read_file", {"path": temp_path})
-        finally:
-            os.unlink(temp_path)
-            del os.environ['REQUIRE_APPROVAL']
+        # Second call with same parameters should raise ValueError
+        with pytest.raises(ValueError, match="REPETITION DETECTED"):
+            agent.execute_tool_call("read_file", {"path": temp_path})
 
-    @patch('agent.OllamaChat')
-    def test_agent_hallucination_prevention(self, mock_ollama):
+    def test_agent_hallucination_prevention(self, agent_factory):
         """Test that agent prevents final_answer without tool execution"""
-        os.environ['REQUIRE_APPROVAL'] = '0'
-        mock_model = Mock()
-        mock_ollama.return_value = mock_model
-
-        agent = DevOpsAgent(
-            tools=[read_file, write_file, bash, get_env],
-            model=mock_model,
-            instructions="Test instructions"
-        )
+        agent = agent_factory(REQUIRE_APPROVAL='0')
 
         # Calling final_answer without any prior tool calls should raise ValueError
         with pytest.raises(ValueError, match="HALLUCINATION ALERT"):
             agent.execute_tool_call("final_answer", {"answer": "fake answer"})
 
-        del os.environ['REQUIRE_APPROVAL']
-
 
 class TestIntegration:
     """Integration tests for full workflows"""
 
-    def test_file_read_write_workflow(self):
+    def test_file_read_write_workflow(self, shared_tmp):
         """Test writing and then reading a file"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            filepath = os.path.join(tmpdir, "integration_test.txt")
-            content = "Integration test content"
+        filepath = str(shared_tmp / "integration_test.txt")
+        content = "Integration test content"
 
-            # Write file
-            write_result = write_file(filepath, content)
-            assert "wrote" in write_result.lower()
+        # Write file
+        write_result = write_file(filepath, content)
+        assert "wrote" in write_result.lower()
 
-            # Read file back
-            read_result = read_file(filepath)
-            assert content in read_result
+        # Read file back
+        read_result = read_file(filepath)
+        assert content in read_result
 
     def test_bash_and_env_workflow(self):
         """Test setting env var and reading it"""
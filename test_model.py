@@ -0,0 +1,101 @@
+"""
+Manual model evaluation harness.
+Runs a set of DevOps queries through the agent and summarizes how the model
+behaved: steps taken, tool calls, JSON parse failures, warnings and errors.
+
+Run with: python test_model.py (requires a running Ollama server)
+"""
+
+import io
+import re
+import time
+from contextlib import redirect_stdout, redirect_stderr
+
+# Test queries covering the main tool paths
+QUERIES = [
+    "Echo 'hello world' using bash",
+    "Get the HOME environment variable",
+    "Write 'test' to /tmp/model_eval.txt and read it back",
+]
+
+# One combined pattern so the captured output is scanned in a single pass
+# instead of one re.findall per marker.
+_OUTPUT_MARKERS = re.compile(
+    r"(?P<step>Step \d+)"
+    r"|(?P<json_err>Failed to parse tool call JSON)"
+    r"|(?P<tool>Calling tool: '\w+')"
+    r"|(?P<warn>⚠️[^\n]*)"
+    r"|(?P<err>❌[^\n]*)"
+)
+
+
+def run_query(agent, query):
+    """Run one query through the agent and collect behavior metrics."""
+    result = {
+        "query": query,
+        "steps": 0,
+        "json_errors": 0,
+        "tool_calls": 0,
+        "errors": [],
+        "final_answer": None,
+        "duration": 0.0,
+    }
+
+    captured = io.StringIO()
+    start = time.perf_counter()
+    try:
+        with redirect_stdout(captured), redirect_stderr(captured):
+            result["final_answer"] = str(agent.run(query))
+    except Exception as e:
+        result["errors"].append(str(e))
+    result["duration"] = time.perf_counter() - start
+
+    output = captured.getvalue()
+    for m in _OUTPUT_MARKERS.finditer(output):
+        group = m.lastgroup
+        if group == "step":
+            result["steps"] += 1
+        elif group == "json_err":
+            result["json_errors"] += 1
+        elif group == "tool":
+            result["tool_calls"] += 1
+        else:  # warn / err lines are kept verbatim for the report
+            line = m.group()
+            # The backend prints parse failures as "❌ ERROR: Failed to
+            # parse tool call JSON …", so the err alternative wins at the
+            # ❌ and consumes the line — classify it here or the headline
+            # JSON-error count never moves
+            if "Failed to parse tool call JSON" in line:
+                result["json_errors"] += 1
+            result["errors"].append(line)
+
+    return result
+
+
+def main():
+    # Import here so just loading this module doesn't construct the backend
+    from agent import agent
+
+    print(f"🧪 Evaluating model on {len(QUERIES)} queries\n")
+
+    results = []
+    for query in QUERIES:
+        print(f"▶ {query}")
+        result = run_query(agent, query)
+        results.append(result)
+        agent.last_tool_call = None  # Reset repetition state between queries
+        status = "✅" if result["final_answer"] and not result["errors"] else "❌"
+        print(
+            f"  {status} {result['steps']} steps, {result['tool_calls']} tool calls, "
+            f"{result['json_errors']} JSON errors, {result['duration']:.1f}s"
+        )
+        for err in result["errors"]:
+            print(f"    {err}")
+
+    total_errors = sum(len(r["errors"]) + r["json_errors"] for r in results)
+    print(f"\n📊 Total: {sum(r['steps'] for r in results)} steps, "
+          f"{sum(r['tool_calls'] for r in results)} tool calls, {total_errors} errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,11 +5,18 @@ Run with: pytest test_ollama_backend.py -v
 
 import os
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from types import SimpleNamespace
+from unittest.mock import Mock
 from ollama_backend import OllamaChat, STRICT_INSTRUCTIONS
 from smolagents.models import ChatMessage
 
 
+@pytest.fixture(scope="module")
+def chat():
+    """One OllamaChat shared by the pure-function tests (it holds no state)."""
+    return OllamaChat()
+
+
 class TestOllamaChatInitialization:
     """Test OllamaChat class initialization"""
 
@@ -31,132 +38,96 @@ class TestOllamaChatInitialization:
         assert chat.endpoint == "http://custom:8080/api/chat"
 
 
-class TestSerializeMessages:
-    """Test message serialization"""
-
-    def test_serialize_simple_dict_message(self):
-        """Test serializing a simple dict message"""
-        chat = OllamaChat()
-        messages = [{"role": "user", "content": "Hello"}]
-        result = chat._serialize_messages(messages)
+def _tool_stub(name, description, doc=None):
+    """Build a tool stub with the attributes _build_tool_list reads."""
+    # __doc__ must be set explicitly or getattr would find the class docstring
+    return SimpleNamespace(name=name, description=description, __doc__=doc)
+
+
+# Pre-built tool stubs shared across tests; plain attribute structs — none
+# of these tests need Mock's call tracking
+READ_FILE_TOOL = _tool_stub("read_file", "Read a file")
+WRITE_FILE_TOOL = _tool_stub("write_file", "Write a file")
+BASH_TOOL = _tool_stub("bash", "Execute bash command")
+DOC_ONLY_TOOL = _tool_stub("test_tool", None, doc="Tool documentation")
+BARE_TOOL = _tool_stub("simple_tool", None)
+
+
+def _tool_response_message():
+    """A message whose role stringifies like MessageRole.TOOL_RESPONSE."""
+    return SimpleNamespace(role="MessageRole.TOOL_RESPONSE", content="Tool output")
+
+
+# (input messages, expected roles in order, substring expected in first content)
+SERIALIZE_CASES = [
+    pytest.param(
+        [{"role": "user", "content": "Hello"}],
+        ["user"], "Hello", id="simple-dict"),
+    pytest.param(
+        [ChatMessage(role="assistant", content="Hi there")],
+        ["assistant"], "Hi there", id="chatmessage-object"),
+    pytest.param(
+        [{"role": "user", "content": [
+            {"type": "text", "text": "First part"},
+            {"type": "text", "text": "Second part"}]}],
+        ["user"], "First part\nSecond part", id="list-content"),
+    pytest.param(
+        [_tool_response_message()],
+        ["tool"], "Tool output", id="tool-response-role"),
+    pytest.param(
+        [{"role": "user", "content": "Question"},
+         {"role": "assistant", "content": "Answer"},
+         {"role": "user", "content": "Follow-up"}],
+        ["user", "assistant", "user"], "Question", id="multiple-messages"),
+]
 
-        assert len(result) == 1
-        assert result[0]["role"] == "user"
-        assert result[0]["content"] == "Hello"
-
-    def test_serialize_chatmessage_object(self):
-        """Test serializing ChatMessage object"""
-        chat = OllamaChat()
-        messages = [ChatMessage(role="assistant", content="Hi there")]
-        result = chat._serialize_messages(messages)
-
-        assert len(result) == 1
-        assert result[0]["role"] == "assistant"
-        assert result[0]["content"] == "Hi there"
-
-    def test_serialize_list_content(self):
-        """Test serializing message with list content"""
-        chat = OllamaChat()
-        messages = [{
-            "role": "user",
-            "content": [
-                {"type": "text", "text": "First part"},
-                {"type": "text", "text": "Second part"}
-            ]
-        }]
-        result = chat._serialize_messages(messages)
 
-        assert len(result) == 1
-        assert "First part\nSecond part" in result[0]["content"]
-
-    def test_serialize_tool_response_role(self):
-        """Test that tool_response role is converted to tool"""
-        chat = OllamaChat()
-        message = Mock()
-        message.role = "MessageRole.TOOL_RESPONSE"
-        message.content = "Tool output"
-
-        result = chat._serialize_messages([message])
-
-        assert result[0]["role"] == "tool"
-        assert result[0]["content"] == "Tool output"
+class TestSerializeMessages:
+    """Test message serialization"""
 
-    def test_serialize_multiple_messages(self):
-        """Test serializing multiple messages"""
-        chat = OllamaChat()
-        messages = [
-            {"role": "user", "content": "Question"},
-            {"role": "assistant", "content": "Answer"},
-            {"role": "user", "content": "Follow-up"}
-        ]
+    @pytest.mark.parametrize("messages,roles,content_substr", SERIALIZE_CASES)
+    def test_serialize(self, chat, messages, roles, content_substr):
+        """Roles are normalized in order and content is flattened"""
         result = chat._serialize_messages(messages)
 
-        assert len(result) == 3
-        assert result[0]["role"] == "user"
-        assert result[1]["role"] == "assistant"
-        assert result[2]["role"] == "user"
+        assert [r["role"] for r in result] == roles
+        assert content_substr in result[0]["content"]
 
 
 class TestBuildToolList:
     """Test tool list building"""
 
-    def test_build_tool_list_with_dict(self):
+    def test_build_tool_list_with_dict(self, chat):
         """Test building tool list from dict"""
-        chat = OllamaChat()
-
-        tool1 = Mock()
-        tool1.name = "read_file"
-        tool1.description = "Read a file"
 
-        tool2 = Mock()
-        tool2.name = "write_file"
-        tool2.description = "Write a file"
-
-        tools = {"read_file": tool1, "write_file": tool2}
+        tools = {"read_file": READ_FILE_TOOL, "write_file": WRITE_FILE_TOOL}
         result = chat._build_tool_list(tools)
 
         assert "Available tools:" in result
         assert "read_file: Read a file" in result
         assert "write_file: Write a file" in result
 
-    def test_build_tool_list_with_list(self):
+    def test_build_tool_list_with_list(self, chat):
         """Test building tool list from list"""
-        chat = OllamaChat()
-
-        tool = Mock()
-        tool.name = "bash"
-        tool.description = "Execute bash command"
 
-        tools = [tool]
+        tools = [BASH_TOOL]
         result = chat._build_tool_list(tools)
 
         assert "Available tools:" in result
         assert "bash: Execute bash command" in result
 
-    def test_build_tool_list_with_docstring(self):
+    def test_build_tool_list_with_docstring(self, chat):
         """Test tool with __doc__ instead of description"""
-        chat = OllamaChat()
-
-        tool = Mock()
-        tool.name = "test_tool"
-        tool.description = None
-        tool.__doc__ = "Tool documentation"
 
-        tools = [tool]
+        tools = [DOC_ONLY_TOOL]
         result = chat._build_tool_list(tools)
 
         assert "test_tool: Tool documentation" in result
 
-    def test_build_tool_list_no_description(self):
+    def test_build_tool_list_no_description(self, chat):
         """Test tool with no description"""
-        chat = OllamaChat()
-
-        tool = Mock()
-        tool.name = "simple_tool"
-        tool.description = None
-        tool.__doc__ = None
 
-        tools = [tool]
+        tools = [BARE_TOOL]
         result = chat._build_tool_list(tools)
 
         assert "simple_tool" in result
@@ -166,16 +137,21 @@ class TestBuildToolList:
 class TestParseToolCalls:
     """Test tool call parsing"""
 
-    def test_parse_single_tool_call_xml(self):
+    def test_tool_call_patterns_precompiled(self):
+        """The parse patterns are compiled once at module scope"""
+        import re
+        import ollama_backend
+        assert isinstance(ollama_backend._TOOL_CALL_RE, re.Pattern)
+        assert isinstance(ollama_backend._MARKDOWN_JSON_RE, re.Pattern)
+
+    def test_parse_single_tool_call_xml(self, chat):
         """Test parsing single tool call in XML format"""
-        chat = OllamaChat()
 
-        message = Mock()
-        message.content = '''
+        message = SimpleNamespace(content='''
         <tool_call>
         {"name": "bash", "arguments": {"command": "ls -la"}}
         </tool_call>
-        '''
+        ''')
 
         result = chat.parse_tool_calls(message)
 
@@ -184,19 +160,17 @@ class TestParseToolCalls:
         assert result.tool_calls[0].function.name == "bash"
         assert result.tool_calls[0].function.arguments["command"] == "ls -la"
 
-    def test_parse_multiple_tool_calls_on_separate_lines(self):
+    def test_parse_multiple_tool_calls_on_separate_lines(self, chat):
         """Test that multiple tool calls on separate lines are captured as one match due to greedy regex"""
-        chat = OllamaChat()
 
-        message = Mock()
-        message.content = '''
+        message = SimpleNamespace(content='''
         <tool_call>
         {"name": "bash", "arguments": {"command": "ls"}}
         </tool_call>
         <tool_call>
         {"name": "read_file", "arguments": {"path": "test.txt"}}
         </tool_call>
-        '''
+        ''')
 
         # Due to greedy regex with re.DOTALL, this will be captured as ONE match
         # containing both tool calls, which will fail JSON parsing
@@ -206,32 +180,28 @@ class TestParseToolCalls:
         # Should have no valid tool calls due to invalid JSON
         assert len(result.tool_calls) == 0
 
-    def test_parse_tool_call_with_missing_brace(self):
+    def test_parse_tool_call_with_missing_brace(self, chat):
         """Test auto-fix of missing closing brace"""
-        chat = OllamaChat()
 
-        message = Mock()
-        message.content = '''
+        message = SimpleNamespace(content='''
         <tool_call>
         {"name": "bash", "arguments": {"command": "ls -la"}
         </tool_call>
-        '''
+        ''')
 
         result = chat.parse_tool_calls(message)
 
         assert len(result.tool_calls) == 1
         assert result.tool_calls[0].function.name == "bash"
 
-    def test_parse_markdown_json_format(self):
+    def test_parse_markdown_json_format(self, chat):
         """Test parsing tool call in markdown JSON format"""
-        chat = OllamaChat()
 
-        message = Mock()
-        message.content = '''
+        message = SimpleNamespace(content='''
         ```json
         {"name": "read_file", "arguments": {"path": "/etc/hosts"}}
         ```
-        '''
+        ''')
 
         result = chat.parse_tool_calls(message)
 
@@ -240,41 +210,23 @@ class TestParseToolCalls:
 
     def test_parse_final_answer_with_other_tools_strips_final_answer(self):
         """Test that final_answer is stripped when present with other tools"""
-        chat = OllamaChat()
-
-        # This would normally raise error for multiple tools,
-        # but we need to test the final_answer stripping logic
-        # So we'll create tool_calls manually
-        from unittest.mock import MagicMock
-
-        message = Mock()
-        message.content = "Some content"
-
-        # Create mock tool calls
-        call1 = MagicMock()
-        call1.function.name = "bash"
-
-        call2 = MagicMock()
-        call2.function.name = "final_answer"
 
-        # Manually set tool_calls to test the stripping logic
-        with patch.object(chat, 'parse_tool_calls') as mock_parse:
-            message.tool_calls = [call1, call2]
+        # Exercise the detection logic directly on manually-built tool calls;
+        # the XML path would raise for multiple calls before reaching it
+        call1 = SimpleNamespace(function=SimpleNamespace(name="bash"))
+        call2 = SimpleNamespace(function=SimpleNamespace(name="final_answer"))
+        tool_calls = [call1, call2]
 
-            # The actual stripping happens in parse_tool_calls
-            # Let's test the logic directly
-            has_final_answer = any(c.function.name == "final_answer" for c in message.tool_calls)
-            has_other_tools = any(c.function.name != "final_answer" for c in message.tool_calls)
+        has_final_answer = any(c.function.name == "final_answer" for c in tool_calls)
+        has_other_tools = any(c.function.name != "final_answer" for c in tool_calls)
 
-            assert has_final_answer == True
-            assert has_other_tools == True
+        assert has_final_answer == True
+        assert has_other_tools == True
 
-    def test_parse_no_tool_calls(self):
+    def test_parse_no_tool_calls(self, chat):
         """Test parsing message with no tool calls"""
-        chat = OllamaChat()
 
-        message = Mock()
-        message.content = "Just a regular message with no tool calls"
+        message = SimpleNamespace(content="Just a regular message with no tool calls")
 
         result = chat.parse_tool_calls(message)
 
@@ -282,21 +234,25 @@ class TestParseToolCalls:
         assert len(result.tool_calls) == 0
 
 
+@pytest.fixture
+def mock_post(monkeypatch):
+    """Install one mocked requests.post; tests configure its return value."""
+    post = Mock()
+    monkeypatch.setattr('ollama_backend.requests.post', post)
+    return post
+
+
+def _ok_response(content):
+    """A successful Ollama-style response carrying the given reply text."""
+    return Mock(ok=True, json=Mock(return_value={"message": {"content": content}}))
+
+
 class TestGenerate:
     """Test message generation"""
 
-    @patch('ollama_backend.requests.post')
-    def test_generate_successful_response(self, mock_post):
+    def test_generate_successful_response(self, mock_post, chat):
         """Test successful message generation"""
-        chat = OllamaChat()
-
-        # Mock the response
-        mock_response = Mock()
-        mock_response.ok = True
-        mock_response.json.return_value = {
-            "message": {"content": "Test response"}
-        }
-        mock_post.return_value = mock_response
+        mock_post.return_value = _ok_response("Test response")
 
         messages = [{"role": "user", "content": "Hello"}]
         result = chat.generate(messages)
@@ -304,21 +260,11 @@ class TestGenerate:
         assert result.content == "Test response"
         assert mock_post.called
 
-    @patch('ollama_backend.requests.post')
-    def test_generate_with_tools(self, mock_post):
+    def test_generate_with_tools(self, mock_post, chat):
         """Test generation with tools"""
-        chat = OllamaChat()
-
-        mock_response = Mock()
-        mock_response.ok = True
-        mock_response.json.return_value = {
-            "message": {"content": "Response with tools"}
-        }
-        mock_post.return_value = mock_response
+        mock_post.return_value = _ok_response("Response with tools")
 
-        tool = Mock()
-        tool.name = "test_tool"
-        tool.description = "Test tool"
+        tool = _tool_stub("test_tool", "Test tool")
 
         messages = [
             {"role": "system", "content": "You are a helpful assistant"},
@@ -335,16 +281,9 @@ class TestGenerate:
         assert 'messages' in payload
         assert len(payload['messages']) > 0
 
-    @patch('ollama_backend.requests.post')
-    def test_generate_handles_error_response(self, mock_post):
+    def test_generate_handles_error_response(self, mock_post, chat):
         """Test handling of error response"""
-        chat = OllamaChat()
-
-        mock_response = Mock()
-        mock_response.ok = False
-        mock_response.status_code = 500
-        mock_response.text = "Server error"
-        mock_post.return_value = mock_response
+        mock_post.return_value = Mock(ok=False, status_code=500, text="Server error")
 
         messages = [{"role": "user", "content": "Hello"}]
 
@@ -355,26 +294,29 @@ class TestGenerate:
 class TestStrictInstructions:
     """Test that STRICT_INSTRUCTIONS are properly defined"""
 
+    # Lowercased once at collection instead of per test
+    SI_LOWER = STRICT_INSTRUCTIONS.lower()
+
+    # Key rules and validation examples the prompt must mention
+    REQUIRED = ["tool_call", "VALIDATION", "CRITICAL RULES",
+                "bash", "write_file", "read_file"]
+    REQUIRED_CASE_INSENSITIVE = ["one tool", "verify"]
+
     def test_strict_instructions_exist(self):
         """Test that STRICT_INSTRUCTIONS constant exists"""
         assert STRICT_INSTRUCTIONS is not None
         assert isinstance(STRICT_INSTRUCTIONS, str)
         assert len(STRICT_INSTRUCTIONS) > 0
 
-    def test_strict_instructions_contain_key_rules(self):
-        """Test that STRICT_INSTRUCTIONS contain important rules"""
-        assert "ONE tool" in STRICT_INSTRUCTIONS or "one tool" in STRICT_INSTRUCTIONS
-        assert "tool_call" in STRICT_INSTRUCTIONS
-        assert "VALIDATION" in STRICT_INSTRUCTIONS
-        assert "CRITICAL RULES" in STRICT_INSTRUCTIONS
-
-    def test_strict_instructions_contain_validation_examples(self):
-        """Test that validation examples are present"""
-        assert "bash" in STRICT_INSTRUCTIONS
-        assert "write_file" in STRICT_INSTRUCTIONS
-        assert "read_file" in STRICT_INSTRUCTIONS
-        # Check for validation keywords
-        assert "verify" in STRICT_INSTRUCTIONS.lower() or "validation" in STRICT_INSTRUCTIONS.lower()
+    @pytest.mark.parametrize("substring", REQUIRED)
+    def test_strict_instructions_contain(self, substring):
+        """Test that STRICT_INSTRUCTIONS contain each required substring"""
+        assert substring in STRICT_INSTRUCTIONS
+
+    @pytest.mark.parametrize("substring", REQUIRED_CASE_INSENSITIVE)
+    def test_strict_instructions_contain_case_insensitive(self, substring):
+        """Test case-insensitive keywords against the precomputed lowercase copy"""
+        assert substring in self.SI_LOWER
 
 
 if __name__ == "__main__":
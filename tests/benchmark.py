@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the agent orchestration loop.
+
+By default this drives a real Ollama server, so numbers include network and
+inference latency. Pass --mock to stub the HTTP transport with canned
+responses and measure only the Python-side orchestration (message
+serialization, tool-call parsing, step loop) — fast and stable enough for
+regression checks in CI.
+
+Run with: python tests/benchmark.py [--mock] [-n ITERATIONS]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from unittest.mock import Mock, patch
+
+import numpy as np
+
+# Allow running from the repo root or the tests/ directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Benchmarks should never block on the approval prompt
+os.environ.setdefault('REQUIRE_APPROVAL', '0')
+
+# Loaded on first setup() call; importing agent pulls in smolagents and
+# rich, which is wasted work when this module is merely collected
+_agent_module = None
+
+DEFAULT_QUERY = "Echo 'benchmark' using bash"
+
+# Canned assistant replies: one tool step, then a final answer
+_MOCK_CONTENTS = [
+    '<tool_call>\n{"name": "bash", "arguments": {"command": "echo benchmark"}}\n</tool_call>',
+    '<tool_call>\n{"name": "final_answer", "arguments": {"answer": "ok"}}\n</tool_call>',
+]
+
+
+def _mock_post(*args, **kwargs):
+    """Stand-in for requests.post cycling through the canned replies.
+
+    The reply position is tracked per thread so parallel iterations each
+    see a coherent tool-call/final-answer sequence.
+    """
+    state = _mock_post._local
+    n = getattr(state, 'n', 0)
+    state.n = n + 1
+    response = Mock()
+    response.ok = True
+    response.json.return_value = {
+        "message": {"content": _MOCK_CONTENTS[n % len(_MOCK_CONTENTS)]}
+    }
+    return response
+
+
+_mock_post._local = threading.local()
+
+
+def setup():
+    """Build the agent once; construction is excluded from the measurement."""
+    global _agent_module
+    if _agent_module is None:
+        import agent as _agent_module
+
+    agent = _agent_module.DevOpsAgent(
+        tools=[_agent_module.read_file, _agent_module.write_file,
+               _agent_module.bash, _agent_module.get_env],
+        model=_agent_module.model,
+        instructions="You are a DevOps automation assistant; use the tools provided and call no other code.",
+        max_steps=15
+    )
+    _agent_module.model.tools = agent.tools
+    return agent
+
+
+def warmup(agent, query):
+    """One discarded run so cold-start cost doesn't skew the statistics."""
+    run(agent, query)
+
+
+def run(agent, query):
+    """Run one iteration and return its duration in seconds."""
+    agent.last_tool_call = None  # Reset repetition state between iterations
+    start_ns = time.perf_counter_ns()
+    agent.run(query)
+    # Integer nanosecond clock; callers keep working in seconds-as-float
+    return (time.perf_counter_ns() - start_ns) / 1e9
+
+
+_worker_state = threading.local()
+
+
+def _run_in_worker(query):
+    """Run one iteration on a per-thread agent (built outside the timer)."""
+    agent = getattr(_worker_state, 'agent', None)
+    if agent is None:
+        agent = _worker_state.agent = setup()
+    return run(agent, query)
+
+
+def _git_commit():
+    """Short hash of HEAD, or None when not running inside a checkout."""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True).strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+def save_json(path, query, iterations, mock, workers, samples):
+    """Write a structured result record for cross-run comparison."""
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "query": query,
+        "iterations": iterations,
+        "mock": mock,
+        "workers": workers,
+        "mean_s": samples.mean(),
+        "stdev_s": samples.std(ddof=1) if samples.size > 1 else None,
+        "median_s": float(np.median(samples)),
+        "p90_s": float(np.percentile(samples, 90)),
+        "p99_s": float(np.percentile(samples, 99)),
+        "min_s": samples.min(),
+        "max_s": samples.max(),
+        "times_s": samples.tolist(),
+    }
+    with open(path, "w") as f:
+        json.dump(record, f, indent=2)
+    print(f"  results written to {path}")
+
+
+def benchmark(query, iterations, mock=False, workers=1, json_path=None):
+    agent = setup()
+
+    transport = (
+        patch('ollama_backend.requests.post', _mock_post)
+        if mock else nullcontext()
+    )
+
+    times = []
+    with transport:
+        print("  warmup...")
+        warmup(agent, query)
+
+        if workers > 1:
+            # Iterations are I/O-bound on the HTTP round-trip, so threads
+            # overlap them; each worker thread keeps its own agent
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                times = list(executor.map(
+                    lambda _: _run_in_worker(query), range(iterations)))
+            for i, duration in enumerate(times):
+                print(f"  run {i + 1}/{iterations}: {duration:.3f}s")
+        else:
+            for i in range(iterations):
+                duration = run(agent, query)
+                times.append(duration)
+                print(f"  run {i + 1}/{iterations}: {duration:.3f}s")
+
+    samples = np.asarray(times)
+    np.save("benchmark_timings.npy", samples)  # Raw samples for offline analysis
+
+    print(f"\n📊 {iterations} iterations ({'mocked' if mock else 'live'} transport)")
+    print(f"  mean:   {samples.mean():.3f}s")
+    if samples.size > 1:
+        print(f"  stdev:  {samples.std(ddof=1):.3f}s")
+    print(f"  median: {np.median(samples):.3f}s")
+    print(f"  p90:    {np.percentile(samples, 90):.3f}s")
+    print(f"  p99:    {np.percentile(samples, 99):.3f}s")
+    print(f"  min:    {samples.min():.3f}s")
+    print(f"  max:    {samples.max():.3f}s")
+
+    if json_path:
+        save_json(json_path, query, iterations, mock, workers, samples)
+    return times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the agent step loop")
+    parser.add_argument("query", nargs="?", default=DEFAULT_QUERY)
+    parser.add_argument("-n", "--iterations", type=int, default=10)
+    parser.add_argument("--mock", action="store_true",
+                        help="Stub the Ollama transport with canned responses")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="Run iterations concurrently on N threads")
+    parser.add_argument("--json", metavar="PATH", dest="json_path",
+                        help="Write structured results (with git commit) to PATH")
+    args = parser.parse_args()
+
+    benchmark(args.query, args.iterations, mock=args.mock,
+              workers=args.workers, json_path=args.json_path)
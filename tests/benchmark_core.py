@@ -0,0 +1,44 @@
+"""
+Pure-CPU bookkeeping helpers for the benchmark harnesses.
+
+Everything here is interpreter-bound glue (no I/O, no agent calls) with
+full type annotations, so the module compiles cleanly with mypyc or
+Cython pure-Python mode for a drop-in speedup — but it runs unmodified
+as plain Python, which is how the repo ships it.
+"""
+
+import math
+from typing import Dict
+
+
+class Aggregate:
+    """Running mean/variance/min/max via Welford's online algorithm."""
+
+    __slots__ = ("n", "mean", "M2", "min", "max")
+
+    def __init__(self) -> None:
+        self.n: int = 0
+        self.mean: float = 0.0
+        self.M2: float = 0.0
+        self.min: float = math.inf
+        self.max: float = -math.inf
+
+    def update(self, x: float) -> None:
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.M2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    def stdev(self) -> float:
+        return math.sqrt(self.M2 / (self.n - 1)) if self.n > 1 else 0.0
+
+
+def update_counts(s: str, needles: Dict[str, str],
+                  counts: Dict[str, int]) -> None:
+    """Add occurrences of each needle in `s` to its counter."""
+    for name, needle in needles.items():
+        counts[name] += s.count(needle)
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Detailed benchmark: per-call Ollama server metrics for each agent step.
+
+Unlike tests/benchmark.py, which times whole iterations from the outside,
+this drives a real Ollama server and intercepts every HTTP response to
+collect the server-side timings Ollama reports per call (model load,
+prompt evaluation, token generation). That breaks an iteration's wall
+time down into where it was actually spent.
+
+Run with: python tests/detailed_benchmark.py [-n ITERATIONS]
+"""
+
+import argparse
+import contextvars
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stderr, redirect_stdout
+
+import numpy as np
+import requests
+
+from benchmark_core import Aggregate, update_counts
+
+# Allow running from the repo root or the tests/ directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Benchmarks should never block on the approval prompt
+os.environ.setdefault('REQUIRE_APPROVAL', '0')
+
+# Intercepted Ollama responses are large JSON blobs; orjson parses the raw
+# bytes much faster than resp.json(), keeping the interception overhead
+# out of the numbers. Stdlib fallback when orjson isn't installed.
+try:
+    import orjson
+    _json_loads = orjson.loads
+
+    def _dumps_indent(obj):
+        # SERIALIZE_NUMPY lets any numpy scalars in the record pass
+        # straight through without .tolist() round-trips
+        return orjson.dumps(
+            obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+except ImportError:
+    _json_loads = json.loads
+
+    def _dumps_indent(obj):
+        return json.dumps(obj, indent=2).encode()
+
+# Loaded on first use, same as tests/benchmark.py
+_agent_module = None
+
+# One pooled session for all Ollama traffic: reusing the TCP connection
+# removes per-step connect/teardown from the measurement. Sized for a
+# handful of concurrent callers without opening a socket per request.
+SESSION = requests.Session()
+_adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8)
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
+
+# Per-call metric fields Ollama reports (durations in nanoseconds)
+OLLAMA_METRICS = (
+    "total_duration",
+    "load_duration",
+    "prompt_eval_duration",
+    "eval_duration",
+    "prompt_eval_count",
+    "eval_count",
+)
+
+# Fixed-schema storage for captured metrics: a structured-array row costs
+# 44 bytes versus ~300 for the equivalent dict, and columns come out ready
+# for vectorized stats
+OLLAMA_DTYPE = np.dtype([
+    ("total_duration", "f8"),
+    ("load_duration", "f8"),
+    ("prompt_eval_duration", "f8"),
+    ("eval_duration", "f8"),
+    ("prompt_eval_count", "i4"),
+    ("eval_count", "i4"),
+])
+
+DEFAULT_QUERIES = [
+    "Echo 'benchmark' using bash",
+    "Get the HOME environment variable",
+]
+
+
+KEEP_ALIVE = "30m"
+
+
+def preload_model(model):
+    """Load the model into Ollama once, before any timed run.
+
+    Every chat request carries keep_alive (see _build_agent), which resets
+    the TTL server-side, so one preload plus a slow refresher is enough —
+    no per-step keep-alive POST needed.
+    """
+    generate_endpoint = model.endpoint.replace("/api/chat", "/api/generate")
+    try:
+        SESSION.post(generate_endpoint,
+                     json={"model": model.model, "prompt": "",
+                           "keep_alive": KEEP_ALIVE},
+                     timeout=300)
+    except requests.RequestException as e:
+        print(f"⚠️  preload failed ({e}); first run will include load time")
+        return
+
+    # Refresh well inside the 30m TTL in case a run goes quiet for long
+    import threading
+    timer = threading.Timer(25 * 60, preload_model, args=(model,))
+    timer.daemon = True
+    timer.start()
+
+
+def _import_agent():
+    """The agent module, imported on first use."""
+    global _agent_module
+    if _agent_module is None:
+        import agent as _agent_module
+    return _agent_module
+
+
+def _build_agent():
+    """Build one agent; construction is excluded from the measurement."""
+    _import_agent()
+    _agent_module.model.keep_alive = KEEP_ALIVE
+    agent = _agent_module.DevOpsAgent(
+        tools=[_agent_module.read_file, _agent_module.write_file,
+               _agent_module.bash, _agent_module.get_env],
+        model=_agent_module.model,
+        instructions="You are a DevOps automation assistant; use the tools provided and call no other code.",
+        max_steps=15
+    )
+    _agent_module.model.tools = agent.tools
+    return agent
+
+
+# Active metrics list for the current run, if any. A ContextVar (rather
+# than a global) keeps concurrent runs from seeing each other's captures.
+_capture_target = contextvars.ContextVar("ollama_metrics", default=None)
+
+
+def _make_capturing_post(original_post):
+    """Wrap requests.post once, at import, instead of per iteration.
+
+    When no run is active the hook is a plain pass-through; during a run
+    it decodes each response and appends Ollama metrics to the list the
+    ContextVar points at.
+    """
+    def capturing_post(*args, **kwargs):
+        captured = _capture_target.get()
+        if captured is None:
+            return original_post(*args, **kwargs)
+        # Route the agent's traffic through the pooled session so the
+        # connection to Ollama is reused across steps
+        resp = SESSION.post(*args, **kwargs)
+
+        # Two cheap gates before paying for JSON tokenization: only the
+        # Ollama endpoints carry metrics, and a memchr-backed substring
+        # scan rules out bodies without them (e.g. streaming chunks)
+        url = args[0] if args else kwargs.get("url", "")
+        if not (url.endswith("/api/chat") or url.endswith("/api/generate")):
+            return resp
+        content = resp.content
+        if b'"total_duration"' not in content:
+            return resp
+
+        try:
+            data = _json_loads(content)
+            captured.append(tuple(data.get(k, 0) for k in OLLAMA_METRICS))
+        except Exception:
+            pass  # Malformed body; nothing to record
+        return resp
+
+    return capturing_post
+
+
+requests.post = _make_capturing_post(requests.post)
+
+
+# Trace lines counted per run; see parse_tool_calls in ollama_backend
+NEEDLES = {
+    "json_parse_errors": "Failed to parse tool call JSON",
+    "auto_fixed_json": "Auto-fixed JSON",
+    "stripped_final_answer": "Stripping final_answer",
+}
+
+
+class CountingSink(io.TextIOBase):
+    """Text sink that counts needle occurrences as writes stream through.
+
+    Only the counters are kept: the benchmark never rereads the trace, so
+    buffering megabytes of ANSI-colored log per iteration would be pure
+    overhead. Memory stays O(1) per needle regardless of trace size.
+    """
+
+    def __init__(self, needles):
+        self.needles = needles
+        self.counts = dict.fromkeys(needles, 0)
+
+    def write(self, s):
+        update_counts(s, self.needles, self.counts)
+        return len(s)
+
+
+# Raw per-run records retained for the saved artifact; older runs only
+# survive in the streaming aggregates
+RECENT_RESULTS = 50
+
+
+def _run_iteration(agent, query, run_num):
+    """Run one iteration and return its result record.
+
+    Module-level (not a method) so the parallel path can ship it to worker
+    processes; the record is a plain picklable dict.
+    """
+    captured = []
+    out_sink = CountingSink(NEEDLES)
+    err_sink = CountingSink(NEEDLES)
+
+    token = _capture_target.set(captured)
+    try:
+        agent.last_tool_call = None  # Reset repetition state between runs
+        start_ns = time.perf_counter_ns()
+        with redirect_stdout(out_sink), redirect_stderr(err_sink):
+            agent.run(query)
+        # Integer nanosecond clock; stored as seconds-as-float for the record
+        duration = (time.perf_counter_ns() - start_ns) / 1e9
+    finally:
+        _capture_target.reset(token)
+
+    result = {
+        "query": query,
+        "run": run_num,
+        "duration_s": duration,
+        "steps": len(captured),
+        "ollama_metrics": np.array(captured, dtype=OLLAMA_DTYPE),
+    }
+    # Each print call arrives as one write, so per-write counting is safe
+    for name in NEEDLES:
+        result[name] = out_sink.counts[name] + err_sink.counts[name]
+    return result
+
+
+# Per-process agent for the parallel path, built lazily on first task
+_worker_agent = None
+
+
+def _run_in_worker(query, run_num):
+    global _worker_agent
+    if _worker_agent is None:
+        _worker_agent = _build_agent()
+    return _run_iteration(_worker_agent, query, run_num)
+
+
+class DetailedBenchmark:
+    """Runs queries repeatedly and records per-step Ollama metrics."""
+
+    def __init__(self, iterations=5):
+        self.iterations = iterations
+        self.results = deque(maxlen=RECENT_RESULTS)
+        # Streaming aggregates: memory stays O(1) however long the run
+        self._duration_agg = Aggregate()
+        self._steps_agg = Aggregate()
+        self._metric_aggs = {k: Aggregate() for k in OLLAMA_METRICS}
+        self._needle_aggs = {k: Aggregate() for k in NEEDLES}
+        self._calls = 0
+
+    def warmup(self, agent, query, n=1):
+        """Discarded runs so cold-start cost doesn't land in the stats.
+
+        The first iteration pays model load, template compilation and
+        interpreter-level caches; running it outside the aggregates keeps
+        it from skewing mean and stdev.
+        """
+        for _ in range(n):
+            _run_iteration(agent, query, 0)
+
+    def run_single_test(self, agent, query, run_num):
+        """Run one iteration, capturing Ollama metrics from each step."""
+        result = _run_iteration(agent, query, run_num)
+        self._update_aggregates(result)
+        self.results.append(result)
+        return result
+
+    def _update_aggregates(self, result):
+        self._duration_agg.update(result["duration_s"])
+        self._steps_agg.update(result["steps"])
+        for name in NEEDLES:
+            self._needle_aggs[name].update(result[name])
+        metrics = result["ollama_metrics"]
+        self._calls += len(metrics)
+        # Column-wise over the structured array: one contiguous slice per
+        # metric feeds its aggregate
+        for key in OLLAMA_METRICS:
+            agg = self._metric_aggs[key]
+            for value in metrics[key]:
+                agg.update(value)
+
+    def run_benchmark(self, queries, max_workers=1):
+        # A single GPU-backed model serializes generation anyway, so more
+        # workers than this only add contention
+        max_workers = min(max_workers, 4)
+        # The parent always needs the model handle for the preload, even
+        # when the agents themselves are built inside workers
+        mod = _import_agent()
+        agent = _build_agent() if max_workers == 1 else None
+        preload_model(mod.model)
+
+        if agent is not None and queries:
+            print("  warmup...")
+            self.warmup(agent, queries[0])
+
+        for query in queries:
+            print(f"\n▶ {query}")
+            if max_workers > 1:
+                # Welford aggregation is order-independent, so results can
+                # be folded in as they complete
+                with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                    futures = [
+                        executor.submit(_run_in_worker, query, run_num)
+                        for run_num in range(1, self.iterations + 1)
+                    ]
+                    for future in as_completed(futures):
+                        self._record(future.result())
+            else:
+                for run_num in range(1, self.iterations + 1):
+                    self._record(_run_iteration(agent, query, run_num))
+
+    def _record(self, result):
+        self._update_aggregates(result)
+        self.results.append(result)
+        line = (f"  run {result['run']}/{self.iterations}: "
+                f"{result['duration_s']:.3f}s ({result['steps']} LLM calls)")
+        if result["json_parse_errors"]:
+            line += f", {result['json_parse_errors']} JSON parse errors"
+        print(line)
+
+    def print_summary(self):
+        agg = self._duration_agg
+        if agg.n == 0:
+            print("No results collected")
+            return
+
+        print(f"\n📊 {agg.n} runs, {self._calls} LLM calls")
+        print(f"  mean run:          {agg.mean:.3f}s")
+        if agg.n > 1:
+            print(f"  stdev run:         {agg.stdev():.3f}s")
+        print(f"  min/max run:       {agg.min:.3f}s / {agg.max:.3f}s")
+        print(f"  mean steps:        {self._steps_agg.mean:.1f}")
+        for name, needle_agg in self._needle_aggs.items():
+            if needle_agg.max > 0:
+                print(f"  mean {name}: {needle_agg.mean:.2f}")
+        for key, metric_agg in self._metric_aggs.items():
+            if metric_agg.n == 0:
+                continue
+            if key.endswith("_duration"):
+                # Ollama reports durations in nanoseconds
+                print(f"  mean {key}: {metric_agg.mean / 1e9:.3f}s")
+            else:
+                print(f"  mean {key}: {metric_agg.mean:.1f}")
+
+    def _summary_dict(self):
+        return {
+            "runs": self._duration_agg.n,
+            "llm_calls": self._calls,
+            "duration_s": {
+                "mean": self._duration_agg.mean,
+                "stdev": self._duration_agg.stdev(),
+                "min": self._duration_agg.min,
+                "max": self._duration_agg.max,
+            },
+            "ollama_metrics_mean": {
+                k: agg.mean for k, agg in self._metric_aggs.items() if agg.n
+            },
+        }
+
+    def _save_results(self, path="full_results.json"):
+        # Structured arrays become per-call dicts again at the JSON boundary
+        recent = []
+        for r in self.results:
+            r = dict(r)
+            r["ollama_metrics"] = [
+                dict(zip(OLLAMA_METRICS, row.item()))
+                for row in r["ollama_metrics"]
+            ]
+            recent.append(r)
+
+        record = {
+            "summary": self._summary_dict(),
+            # Only the most recent runs are kept raw; the summary covers all
+            "recent_results": recent,
+        }
+        # Binary write of orjson's bytes output; decoding to str only to
+        # re-encode on write would throw the serialization win away
+        with open(path, "wb") as f:
+            f.write(_dumps_indent(record))
+        print(f"\n  results written to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Per-step Ollama metrics for the agent loop")
+    parser.add_argument("-n", "--iterations", type=int, default=5)
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="Run iterations concurrently in N processes (max 4)")
+    args = parser.parse_args()
+
+    benchmark = DetailedBenchmark(iterations=args.iterations)
+    benchmark.run_benchmark(DEFAULT_QUERIES, max_workers=args.workers)
+    benchmark.print_summary()
+    benchmark._save_results()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Variability check: run the whole scenario suite several times concurrently
+and report how stable the pass counts are across runs.
+
+Each run is a test_runner.py subprocess; its pass/fail counts come back as
+a one-line JSON summary over a dedicated pipe (--json-summary-fd), so the
+parent never buffers or scrapes the child's log output.
+
+Run with: python tests/parallel_variability_test.py [-n RUNS] [-w WORKERS]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import threading
+from collections import deque
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor,
+                                as_completed)
+from pathlib import Path
+
+# Allow importing test_runner when launched from the repo root
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+# Ring-buffer sizing for child logs: keep this many lines while draining,
+# save at most this many into a failed run's result
+LOG_TAIL_LINES = 2000
+LOG_TAIL_SAVED = 200
+
+
+def _run_suite_in_process(config_file, run_num):
+    """One suite run inside this interpreter via test_runner.run_suite."""
+    import test_runner
+
+    config = test_runner.load_config(config_file)
+    summary = test_runner.run_suite(config=config)
+    return {"run": run_num, "returncode": 0 if summary["failed"] == 0 else 1,
+            "passed": summary["passed"], "failed": summary["failed"],
+            "total": summary["total"]}
+
+
+class ParallelVariabilityTester:
+    """Fans out N full suite runs and summarizes pass-count stability."""
+
+    __test__ = False  # Framework class, not a pytest test
+
+    def __init__(self, num_runs=5, max_workers=3, config_file="config.json",
+                 in_process=False):
+        self.num_runs = num_runs
+        # In-process runs share one interpreter, and the runner mutates
+        # process-global state per test (cwd, sys.stdout via redirect,
+        # os.environ). Concurrent threads would validate against each
+        # other's cwd and clobber env vars, corrupting the very pass
+        # counts being measured — so in-process mode is serial.
+        if in_process and max_workers != 1:
+            print("⚠️  --in-process runs share interpreter state; "
+                  "forcing 1 worker")
+            max_workers = 1
+        self.max_workers = max_workers
+        self.config_file = config_file
+        self.in_process = in_process
+        self.test_dir = Path(__file__).parent
+        # Shared by every subprocess run; building these per submit would
+        # re-copy the environment and re-resolve paths for each task
+        self._env = os.environ.copy()
+        # N workers each spinning up BLAS thread pools would oversubscribe
+        # the cores the pinning below hands out
+        self._env.setdefault("OMP_NUM_THREADS", "1")
+        self._env.setdefault("MKL_NUM_THREADS", "1")
+        # Cores available for pinning; empty on platforms without affinity
+        self._cores = (sorted(os.sched_getaffinity(0))
+                       if hasattr(os, "sched_getaffinity") else [])
+        self._cmd_template = [
+            sys.executable, str(self.test_dir / "test_runner.py"), "--no-save",
+        ]
+        if config_file != "config.json":
+            self._cmd_template += ["--config", config_file]
+
+    def run_single_variability_test(self, run_num):
+        """One suite run in a subprocess; returns its summary counts."""
+        read_fd, write_fd = os.pipe()
+        cmd = self._cmd_template + ["--json-summary-fd", str(write_fd)]
+
+        # Pin each run to its own core subset: unpinned workers migrating
+        # across caches inflate the very variance this harness measures
+        preexec_fn = None
+        if self._cores:
+            cores_per_worker = max(1, len(self._cores) // self.max_workers)
+            start = ((run_num - 1) * cores_per_worker) % len(self._cores)
+            core_set = {
+                self._cores[(start + i) % len(self._cores)]
+                for i in range(cores_per_worker)
+            }
+            preexec_fn = lambda: os.sched_setaffinity(0, core_set)
+
+        # Counts come over the dedicated pipe; the log is only kept as a
+        # bounded tail for diagnosing failed runs, never buffered whole
+        tail = deque(maxlen=LOG_TAIL_LINES)
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            pass_fds=(write_fd,),
+            env=self._env,
+            text=True,
+            preexec_fn=preexec_fn,
+        )
+        os.close(write_fd)  # Child holds its own copy
+
+        def _drain():
+            for line in proc.stdout:
+                tail.append(line.rstrip("\n"))
+
+        reader = threading.Thread(target=_drain, daemon=True)
+        reader.start()
+        proc.wait()
+        reader.join(timeout=5)
+
+        try:
+            summary = _json_loads(os.read(read_fd, 4096))
+        except (ValueError, OSError):
+            summary = {"passed": 0, "failed": 0, "total": 0}
+        finally:
+            os.close(read_fd)
+
+        result = {"run": run_num, "returncode": proc.returncode, **summary}
+        if proc.returncode != 0:
+            # Only the recent tail — enough for diagnosis, bounded in size
+            result["log_tail"] = list(tail)[-LOG_TAIL_SAVED:]
+        return result
+
+    def run_parallel_variability_tests(self):
+        mode = "in-process" if self.in_process else "subprocess"
+        print(f"🔁 {self.num_runs} suite runs, {self.max_workers} workers "
+              f"({mode})\n")
+        run_results = []
+        if self.in_process:
+            # One interpreter, one import of the agent stack; runs go one
+            # at a time (see __init__) because the runner mutates
+            # process-global state
+            executor_cls = ThreadPoolExecutor
+            submit_args = [(_run_suite_in_process, self.config_file, n)
+                           for n in range(1, self.num_runs + 1)]
+        else:
+            executor_cls = ProcessPoolExecutor
+            submit_args = [(self.run_single_variability_test, n)
+                           for n in range(1, self.num_runs + 1)]
+
+        with executor_cls(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(fn, *args) for fn, *args in submit_args]
+            for future in as_completed(futures):
+                result = future.result()
+                run_results.append(result)
+                print(f"  run {result['run']}: "
+                      f"{result['passed']}/{result['total']} passed")
+
+        self.print_summary(run_results)
+        return run_results
+
+    def print_summary(self, run_results):
+        if not run_results:
+            print("No runs completed")
+            return
+
+        # One fused pass instead of a list plus separate sum/min/max scans
+        n = total_passed = 0
+        min_passed = max_passed = run_results[0]["passed"]
+        totals = set()
+        for r in run_results:
+            n += 1
+            passed = r["passed"]
+            total_passed += passed
+            if passed < min_passed:
+                min_passed = passed
+            if passed > max_passed:
+                max_passed = passed
+            totals.add(r["total"])
+
+        print(f"\n📊 pass counts across {n} runs")
+        print(f"  mean: {total_passed / n:.1f}")
+        print(f"  min:  {min_passed}")
+        print(f"  max:  {max_passed}")
+        if len(totals) == 1 and min_passed == max_passed:
+            print("  ✅ fully consistent")
+        else:
+            print("  ⚠️  results vary between runs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the scenario suite repeatedly to measure variability")
+    parser.add_argument("-n", "--runs", type=int, default=5)
+    parser.add_argument("-w", "--workers", type=int, default=3)
+    parser.add_argument("--config", default="config.json",
+                        help="Config file passed through to test_runner.py")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Run suites serially in this interpreter "
+                             "(amortizes imports) instead of one "
+                             "subprocess per run")
+    args = parser.parse_args()
+
+    tester = ParallelVariabilityTester(
+        num_runs=args.runs, max_workers=args.workers, config_file=args.config,
+        in_process=args.in_process)
+    tester.run_parallel_variability_tests()
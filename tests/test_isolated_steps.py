@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Isolated timings for the individual steps of the agent pipeline.
+
+Probes OllamaChat.generate directly — no smolagents loop — so the cost of
+bare generation, tool-aware generation, and tool-call parsing can each be
+seen on their own. All probes share one warm model: keep_alive rides on
+every request and a warmup ping is sent first, so only the first request
+ever pays model-load cost.
+
+Needs a running Ollama server. Skipped under pytest unless
+RUN_NETWORK_TESTS=1. Run with: python tests/test_isolated_steps.py
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+# Allow running from the repo root or the tests/ directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytestmark = pytest.mark.skipif(
+    os.environ.get("RUN_NETWORK_TESTS") != "1",
+    reason="needs a live Ollama server; set RUN_NETWORK_TESTS=1 to run",
+)
+
+KEEP_ALIVE = "10m"
+
+
+def _build_model():
+    from ollama_backend import OllamaChat
+
+    ollama_host = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+    model = OllamaChat(model="qwen3-devops",
+                       endpoint=f"{ollama_host}/api/chat",
+                       keep_alive=KEEP_ALIVE)
+    return model
+
+
+def _timed(fn, *args, **kwargs):
+    start_ns = time.perf_counter_ns()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter_ns() - start_ns) / 1e9
+
+
+def _warmup(model):
+    """One discarded ping so no probe pays model-load cost."""
+    model.generate([{"role": "user", "content": "ping"}])
+
+
+def probe_bare_generation(model):
+    """TEST 1: plain generation, no tools, no system prompt."""
+    message, duration = _timed(
+        model.generate, [{"role": "user", "content": "Say OK"}])
+    return {"probe": "bare_generation", "duration_s": duration,
+            "content": message.content}
+
+
+def probe_tool_aware_generation(model):
+    """TEST 2: generation with the strict instructions and tool list."""
+    from agent import bash, get_env, read_file, write_file
+
+    messages = [{"role": "user", "content": "Get the HOME environment variable"}]
+    message, duration = _timed(
+        model.generate, messages, tools=[read_file, write_file, bash, get_env])
+    return {"probe": "tool_aware_generation", "duration_s": duration,
+            "content": message.content}
+
+
+def probe_tool_call_parsing(model):
+    """TEST 3: generation plus parse_tool_calls on the reply."""
+    from agent import bash, get_env, read_file, write_file
+
+    messages = [{"role": "user", "content": "Echo 'probe' using bash"}]
+    message, gen_duration = _timed(
+        model.generate, messages, tools=[read_file, write_file, bash, get_env])
+    parsed, parse_duration = _timed(model.parse_tool_calls, message)
+    return {"probe": "tool_call_parsing",
+            "duration_s": gen_duration + parse_duration,
+            "parse_s": parse_duration,
+            "tool_calls": len(parsed.tool_calls)}
+
+
+PROBES = (probe_bare_generation, probe_tool_aware_generation,
+          probe_tool_call_parsing)
+
+
+def test_isolated_steps_complete():
+    """Every probe finishes against a warm model."""
+    model = _build_model()
+    _warmup(model)
+    for probe in PROBES:
+        result = probe(model)
+        assert result["duration_s"] > 0
+
+
+def main():
+    model = _build_model()
+    print(f"🔍 Probing isolated steps on {model.model}")
+    print("  warmup ping...")
+    _, warm_s = _timed(_warmup, model)
+    print(f"  warmup: {warm_s:.3f}s (includes any model load)\n")
+
+    for probe in PROBES:
+        result = probe(model)
+        print(f"  {result['probe']}: {result['duration_s']:.3f}s")
+        if "parse_s" in result:
+            print(f"    parse only: {result['parse_s'] * 1e3:.2f}ms, "
+                  f"{result['tool_calls']} tool call(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,691 @@
+#!/usr/bin/env python3
+"""
+Scenario test runner for the DevOps agent.
+
+Drives a real Ollama server through DevOpsAgent for each JSON case in
+tests/cases/, then validates the run: which tools were called, what files
+were written into the scratch directory, and what the final answer said.
+Results are saved under tests/results/run_<timestamp>/ with a `latest`
+symlink, unless --no-save is given.
+
+Run with: python tests/test_runner.py [--category NAME] [--test ID]
+                                      [--config FILE] [--no-save]
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stderr, redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+# Allow running from the repo root or the tests/ directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The runner must never block on the approval prompt
+os.environ.setdefault('REQUIRE_APPROVAL', '0')
+
+# orjson for every JSON path (case parsing, config, results, summary
+# line); stdlib fallback keeps the runner dependency-free
+try:
+    from orjson import dumps as _dumps_bytes, loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+    def _dumps_bytes(obj):
+        return json.dumps(obj).encode()
+
+TESTS_DIR = Path(__file__).parent
+
+DEFAULT_CONFIG = {
+    "cases_dir": "cases",
+    "results_dir": "results",
+    "max_steps": 15,
+}
+
+# Loaded on first agent build, same as the benchmarks
+_agent_module = None
+
+
+def load_config(path):
+    """Merge a JSON config file over the defaults; missing file is fine."""
+    config = dict(DEFAULT_CONFIG)
+    config_path = Path(path)
+    if not config_path.is_absolute():
+        config_path = TESTS_DIR / config_path
+    if config_path.exists():
+        config.update(_json_loads(config_path.read_bytes()))
+    return config
+
+
+# Per-process runner for the parallel path, built lazily on first task
+_worker_runner = None
+
+
+def _run_single(case, config):
+    """Run one case in a worker process (module-level so it pickles)."""
+    global _worker_runner
+    if _worker_runner is None:
+        _worker_runner = TestRunner(config=config, save=False)
+    return _worker_runner.run_case(case)
+
+
+# Distinguishes "nothing missing" from falsy values in the validators
+_SENTINEL = object()
+
+# Below this many values, per-value substring scans beat building an
+# Aho-Corasick automaton for the file
+_AHO_MIN_VALUES = 8
+
+try:
+    import ahocorasick as _ahocorasick
+except ImportError:
+    _ahocorasick = None
+
+# Above this size the byte-at-a-time scan per value starts to hurt and
+# a SIMD engine pays for its compile step
+_LARGE_CONTENT_BYTES = 1 << 20
+
+try:
+    import hyperscan as _hyperscan
+except ImportError:
+    _hyperscan = None
+
+
+def _fast_rmtree(path):
+    """Remove a scratch tree with dir_fd-relative unlinks.
+
+    shutil.rmtree stats and re-resolves every entry by full path; fwalk
+    hands out an fd per directory so each unlink/rmdir is one syscall
+    relative to it. Scratch dirs are created by us and contain only what
+    the case and the agent wrote, so the generic handling is not needed.
+    """
+    for _dirpath, dirnames, filenames, dirfd in os.fwalk(
+            path, topdown=False, follow_symlinks=False):
+        for name in filenames:
+            os.unlink(name, dir_fd=dirfd)
+        for name in dirnames:
+            try:
+                os.rmdir(name, dir_fd=dirfd)
+            except OSError:
+                # Symlink to a directory: listed here but not a dir itself
+                os.unlink(name, dir_fd=dirfd)
+    os.rmdir(path)
+
+
+def _as_dict(call):
+    """Tracked (tool_name, arguments) tuple → report-schema dict."""
+    tool_name, arguments = call
+    return {"tool": tool_name, "arguments": arguments}
+
+
+class TestValidator:
+    """Applies a test case's validation specs to an execution result."""
+
+    __test__ = False  # Framework class, not a pytest test
+
+    def __init__(self):
+        # Compiled once per unique pattern; cases reuse regexes across
+        # assertions and across suite runs
+        self._regex_cache = {}
+        # Raw file bytes read once per test, shared by every assertion
+        # against the same file; cleared by reset() between tests
+        self._file_cache = {}
+        # Aho-Corasick automatons keyed by values tuple; like the regexes,
+        # cases reuse the same values lists across assertions and runs
+        self._automaton_cache = {}
+        # Compiled hyperscan databases, same keying; only consulted for
+        # large files when the binding is installed
+        self._hs_cache = {}
+
+    def reset(self):
+        """Drop per-test state; compiled regexes survive across tests."""
+        self._file_cache.clear()
+
+    def _read(self, full_path):
+        """File bytes, read at most once per test; None if missing."""
+        key = str(full_path)
+        if key not in self._file_cache:
+            try:
+                self._file_cache[key] = Path(full_path).read_bytes()
+            except OSError:
+                self._file_cache[key] = None
+        return self._file_cache[key]
+
+    def validate(self, validation, execution_result, test_env):
+        """Run one validation spec; returns (passed, detail)."""
+        vtype = validation.get("type")
+        handler = getattr(self, f"_validate_{vtype}", None)
+        if handler is None:
+            return False, f"unknown validation type: {vtype}"
+        return handler(validation, execution_result, test_env)
+
+    # -- tool-call validators --------------------------------------------
+
+    def _tool_index(self, execution_result):
+        # {tool_name: [arguments, ...]} built once per test and memoized
+        # on the result dict; membership and counts are then O(1) per
+        # assertion instead of a scan over the call list
+        index = execution_result.get("_tool_index")
+        if index is None:
+            index = defaultdict(list)
+            for name, args in execution_result["tool_calls"]:
+                index[name].append(args)
+            execution_result["_tool_index"] = index
+        return index
+
+    def _validate_tool_called(self, validation, execution_result, test_env):
+        tool = validation["tool"]
+        if tool in self._tool_index(execution_result):
+            return True, ""
+        return False, f"tool '{tool}' was never called"
+
+    def _validate_tool_not_called(self, validation, execution_result, test_env):
+        tool = validation["tool"]
+        if tool not in self._tool_index(execution_result):
+            return True, ""
+        return False, f"tool '{tool}' was called but should not be"
+
+    def _validate_tool_call_count(self, validation, execution_result, test_env):
+        tool = validation["tool"]
+        count = len(self._tool_index(execution_result).get(tool, ()))
+        expected = validation["count"]
+        if count == expected:
+            return True, ""
+        return False, f"tool '{tool}' called {count} times, expected {expected}"
+
+    # -- file validators -------------------------------------------------
+
+    def _validate_file_content_contains(self, validation, execution_result,
+                                        test_env):
+        path = validation["path"]
+        content = self._read(Path(test_env) / path)
+        if content is None:
+            return False, f"file '{path}' was not created"
+        values = validation["values"]
+        # Large files: compile every value into one hyperscan database
+        # (SIMD-backed, cached per values tuple) and scan the file once.
+        # Values are literal substrings, so they are regex-escaped. Any
+        # compile problem drops through to the pure-Python paths.
+        if _hyperscan is not None and len(content) > _LARGE_CONTENT_BYTES:
+            key = tuple(values)
+            db = self._hs_cache.get(key)
+            if db is None:
+                try:
+                    db = _hyperscan.Database()
+                    db.compile(
+                        expressions=[re.escape(v).encode() for v in values],
+                        ids=list(range(len(values))))
+                except Exception:
+                    db = None
+                self._hs_cache[key] = db
+            if db is not None:
+                matched = set()
+                db.scan(content,
+                        match_event_handler=lambda i, *_a: matched.add(i))
+                missing = [v for i, v in enumerate(values)
+                           if i not in matched]
+                if not missing:
+                    return True, ""
+                return False, f"file '{path}' missing: {missing}"
+        # Large values lists: one automaton pass over the file instead of
+        # one scan per value — O(content) regardless of how many required
+        # substrings the case piles on. Small lists and installs without
+        # pyahocorasick take the per-value path below.
+        if _ahocorasick is not None and len(values) >= _AHO_MIN_VALUES:
+            key = tuple(values)
+            automaton = self._automaton_cache.get(key)
+            if automaton is None:
+                automaton = _ahocorasick.Automaton()
+                for v in values:
+                    automaton.add_word(v, v)
+                automaton.make_automaton()
+                self._automaton_cache[key] = automaton
+            # The automaton walks str; decode once for this path only
+            text = content.decode(errors="replace")
+            matched = {found for _end, found in automaton.iter(text)}
+            missing = [v for v in values if v not in matched]
+            if not missing:
+                return True, ""
+            return False, f"file '{path}' missing: {missing}"
+        # Compare in bytes; decoding is pure overhead for containment.
+        # Short-circuit on the pass path — the full missing list is only
+        # built when there is a failure to report.
+        first_missing = next(
+            (v for v in values if v.encode() not in content), _SENTINEL)
+        if first_missing is _SENTINEL:
+            return True, ""
+        missing = [v for v in values if v.encode() not in content]
+        return False, f"file '{path}' missing: {missing}"
+
+    def _validate_file_content_matches(self, validation, execution_result,
+                                       test_env):
+        path = validation["path"]
+        content = self._read(Path(test_env) / path)
+        if content is None:
+            return False, f"file '{path}' was not created"
+        pattern = validation["pattern"]
+        compiled = self._regex_cache.get(pattern)
+        if compiled is None:
+            # re handles bytes patterns natively, matching the byte cache
+            compiled = self._regex_cache.setdefault(
+                pattern, re.compile(pattern.encode()))
+        if compiled.search(content):
+            return True, ""
+        return False, f"file '{path}' does not match /{pattern}/"
+
+    # -- answer validators -----------------------------------------------
+
+    def _validate_final_answer_contains(self, validation, execution_result,
+                                        test_env):
+        # Lowercased once per test, not once per assertion; the memo lives
+        # on the result dict so it is dropped with the rest of the record
+        answer = execution_result.get("_final_answer_lower")
+        if answer is None:
+            answer = execution_result.setdefault(
+                "_final_answer_lower",
+                str(execution_result.get("final_answer", "")).lower())
+        values = validation["values"]
+        first_missing = next(
+            (v for v in values if v.lower() not in answer), _SENTINEL)
+        if first_missing is _SENTINEL:
+            return True, ""
+        missing = [v for v in values if v.lower() not in answer]
+        return False, f"final answer missing: {missing}"
+
+
+class TestRunner:
+    """Loads, executes and validates the JSON scenario cases."""
+
+    __test__ = False  # Framework class, not a pytest test
+
+    def __init__(self, config=None, save=True):
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.validator = TestValidator()
+        self.save = save
+        self.results = []
+        # Tool-call destination for the test currently executing; the
+        # tracking wrapper is installed once per agent and checks this
+        # instead of being patched in and out around every test
+        self._tool_calls = None
+        # Parsed cases keyed by path so repeated loads (category filtering,
+        # multi-run callers) don't re-open and re-parse the files
+        self._case_cache = {}
+        # Agent built lazily on the first test and reused for the rest of
+        # the suite; see _build_agent
+        self._agent = None
+        # Scratch dirs go on tmpfs when available so fixture setup and
+        # rmtree never touch a block device; fixtures must fit in RAM.
+        # config["temp_dir_root"] overrides, None falls back to $TMPDIR.
+        tmp_root = self.config.get("temp_dir_root")
+        if tmp_root is None and os.access("/dev/shm", os.W_OK):
+            tmp_root = "/dev/shm"
+        self._tmp_root = tmp_root
+
+    # -- case loading ----------------------------------------------------
+
+    def load_test_case(self, path):
+        case = self._case_cache.get(path)
+        if case is None:
+            # loads-on-bytes skips the stream decoder json.load goes through
+            case = self._case_cache[path] = _json_loads(
+                Path(path).read_bytes())
+        return case
+
+    def load_test_cases(self, category=None, test_name=None):
+        """All cases from cases_dir, optionally filtered."""
+        cases_dir = TESTS_DIR / self.config["cases_dir"]
+        # scandir hands back entries with cached type info — no per-file
+        # stat, and names are filtered before any Path objects are built
+        with os.scandir(cases_dir) as it:
+            names = [e.name for e in it
+                     if e.name.endswith(".json") and e.is_file()]
+        names.sort()
+
+        cases = []
+        for name in names:
+            case = self.load_test_case(cases_dir / name)
+            if category and case.get("category") != category:
+                continue
+            if test_name and case.get("id") != test_name:
+                continue
+            cases.append(case)
+        return cases
+
+    # -- environment -----------------------------------------------------
+
+    def setup_test_environment(self, case):
+        """Scratch directory seeded with the case's setup files."""
+        test_env = tempfile.mkdtemp(prefix="agent_test_", dir=self._tmp_root)
+        seen_dirs = set()
+        for rel_path, content in case.get("setup_files", {}).items():
+            full_path = os.path.join(test_env, rel_path)
+            parent = os.path.dirname(full_path)
+            # One makedirs per distinct directory, not per file
+            if parent not in seen_dirs:
+                os.makedirs(parent, exist_ok=True)
+                seen_dirs.add(parent)
+            with open(full_path, "wb") as f:
+                f.write(content.encode()
+                        if isinstance(content, str) else content)
+        return test_env
+
+    def cleanup(self, test_env):
+        if self.config.get("fast_cleanup", True):
+            try:
+                _fast_rmtree(test_env)
+                return
+            except OSError:
+                pass  # Fall through to the forgiving path
+        shutil.rmtree(test_env, ignore_errors=True)
+
+    # -- execution -------------------------------------------------------
+
+    def _build_agent(self):
+        """The suite's shared agent, built on first use.
+
+        The backend model is a module-level singleton with a pooled HTTP
+        session, and agent.run() resets conversation memory on entry, so
+        one DevOpsAgent serves every test — constructing a fresh one per
+        case only repeated prompt and tool-schema setup.
+        """
+        if self._agent is not None:
+            return self._agent
+
+        global _agent_module
+        if _agent_module is None:
+            import agent as _agent_module
+
+        mod = _agent_module
+        agent = mod.DevOpsAgent(
+            tools=[mod.read_file, mod.write_file, mod.bash, mod.get_env],
+            model=mod.model,
+            instructions="You are a DevOps automation assistant; use the tools provided and call no other code.",
+            max_steps=self.config["max_steps"]
+        )
+        mod.model.tools = agent.tools
+        self._install_tracker(agent)
+        self._agent = agent
+        return agent
+
+    def _install_tracker(self, agent):
+        """Wrap execute_tool_call once; no per-test patch and restore.
+
+        sys.monitoring would be cheaper still, but its callbacks only see
+        code objects — the validators need the call arguments, so the
+        wrapper stays. When no test is active it is a plain pass-through.
+        """
+        original_execute = agent.execute_tool_call
+
+        def tracking_execute(tool_name, arguments):
+            calls = self._tool_calls
+            if calls is not None:
+                # Bare 2-tuple: no dict construction in the hot path; the
+                # report boundary rebuilds dicts via _as_dict
+                calls.append((tool_name, arguments))
+            return original_execute(tool_name, arguments)
+
+        agent.execute_tool_call = tracking_execute
+
+    def execute_test(self, case):
+        """Run one case inside its scratch directory, tracking tool calls."""
+        test_env = self.setup_test_environment(case)
+        agent = self._build_agent()
+
+        tool_calls = []
+        self._tool_calls = tool_calls
+
+        trace = io.StringIO()
+        old_cwd = os.getcwd()
+        final_answer = None
+        error = None
+
+        # Cases can set env vars for the run. One bulk snapshot/restore
+        # instead of per-key save-and-pop bookkeeping; restoring the full
+        # snapshot also undoes anything the agent itself exported.
+        env_vars = case.get("env_vars")
+        env_snapshot = os.environ.copy() if env_vars else None
+        if env_vars:
+            os.environ.update(env_vars)
+
+        os.chdir(test_env)
+        start_ns = time.perf_counter_ns()
+        try:
+            with redirect_stdout(trace), redirect_stderr(trace):
+                final_answer = agent.run(case["query"])
+        except Exception as e:
+            error = str(e)
+        finally:
+            duration = (time.perf_counter_ns() - start_ns) / 1e9
+            os.chdir(old_cwd)
+            self._tool_calls = None
+            if env_snapshot is not None:
+                os.environ.clear()
+                os.environ.update(env_snapshot)
+
+        execution_result = {
+            "tool_calls": tool_calls,
+            "final_answer": final_answer,
+            "error": error,
+            "errors": self._extract_errors_from_agent(trace.getvalue()),
+            "duration_s": duration,
+        }
+        return execution_result, test_env
+
+    def _extract_errors_from_agent(self, trace):
+        """Error lines printed during the run (parse failures, tool errors).
+
+        One lowercase pass per line and a configurable cap: a run that
+        spirals into repeated failures produces a bounded errors list
+        instead of one entry per log line.
+        """
+        cap = self.config.get("max_errors_collected", 16)
+        out = []
+        for line in trace.splitlines():
+            if "❌" in line or "error" in line.lower():
+                out.append(line.strip())
+                if len(out) >= cap:
+                    break
+        return out
+
+    # -- orchestration ---------------------------------------------------
+
+    def run_case(self, case, keep_env_on_fail=False):
+        """Execute and validate one case; returns its result record.
+
+        With keep_env_on_fail, a failing case's scratch directory is left
+        on disk for inspection and its path is put on the record.
+        """
+        execution_result, test_env = self.execute_test(case)
+        failures = []
+        try:
+            self.validator.reset()
+            for validation in case.get("validations", []):
+                ok, detail = self.validator.validate(
+                    validation, execution_result, test_env)
+                if not ok:
+                    failures.append(detail)
+            if execution_result["error"]:
+                failures.append(f"run error: {execution_result['error']}")
+        finally:
+            kept = keep_env_on_fail and failures
+            if not kept:
+                self.cleanup(test_env)
+
+        record = {
+            "id": case["id"],
+            "name": case.get("name", ""),
+            "category": case.get("category", ""),
+            "status": "PASS" if not failures else "FAIL",
+            "failures": failures,
+            "duration_s": execution_result["duration_s"],
+            "tool_calls": [_as_dict(c)
+                           for c in execution_result["tool_calls"]],
+            "final_answer": str(execution_result["final_answer"]),
+            "errors": execution_result["errors"],
+        }
+        if kept:
+            record["test_env"] = test_env
+        return record
+
+    def _report(self, case, result):
+        print(f"\n▶ {case['id']}: {case.get('name', '')}")
+        mark = "✓" if result["status"] == "PASS" else "✗"
+        print(f"  {mark} {result['status']} ({result['duration_s']:.1f}s)")
+        for detail in result["failures"]:
+            print(f"    - {detail}")
+        if "test_env" in result:
+            print(f"    scratch dir kept: {result['test_env']}")
+
+    def run_tests(self, category=None, test_name=None, parallel=1,
+                  fail_fast=False):
+        cases = self.load_test_cases(category, test_name)
+        if not cases:
+            print("No matching test cases")
+            return {"passed": 0, "failed": 0, "total": 0, "results": []}
+
+        passed = failed = 0
+
+        def record(case, result):
+            nonlocal passed, failed
+            if result["status"] == "PASS":
+                passed += 1
+            else:
+                failed += 1
+            self._report(case, result)
+            self.results.append(result)
+
+        if parallel > 1:
+            # Cases are independent (own scratch dir, own agent), so they
+            # fan out across processes; completed results are buffered and
+            # flushed in submission order so the report stays readable
+            with ProcessPoolExecutor(max_workers=parallel) as executor:
+                futures = {
+                    executor.submit(_run_single, case, self.config): idx
+                    for idx, case in enumerate(cases)
+                }
+                done = {}
+                next_idx = 0
+                for future in as_completed(futures):
+                    done[futures[future]] = future.result()
+                    while next_idx in done:
+                        record(cases[next_idx], done.pop(next_idx))
+                        next_idx += 1
+                    if fail_fast and failed:
+                        # Already-running workers finish; queued cases don't
+                        for f in futures:
+                            f.cancel()
+                        break
+        else:
+            for case in cases:
+                result = self.run_case(case, keep_env_on_fail=fail_fast)
+                record(case, result)
+                if fail_fast and result["status"] == "FAIL":
+                    break
+
+        summary = {"passed": passed, "failed": failed, "total": len(cases),
+                   "results": self.results}
+        print(f"\n📊 {passed}/{len(cases)} passed")
+        return summary
+
+    # -- persistence -----------------------------------------------------
+
+    def save_results(self, summary):
+        results_dir = TESTS_DIR / self.config["results_dir"]
+        run_dir = results_dir / f"run_{datetime.now():%Y%m%d_%H%M%S}"
+        run_dir.mkdir(parents=True, exist_ok=True)
+
+        # Stream one result at a time: peak memory stays at one record
+        # instead of the whole suite plus its serialized text. Binary
+        # mode because orjson emits bytes directly.
+        with open(run_dir / "summary.json", "wb") as f:
+            f.write(f'{{"passed": {summary["passed"]}, '
+                    f'"failed": {summary["failed"]}, '
+                    f'"total": {summary["total"]}, "results": [\n'.encode())
+            for i, result in enumerate(summary["results"]):
+                if i:
+                    f.write(b",\n")
+                f.write(_dumps_bytes(result))
+            f.write(b"\n]}\n")
+
+        latest = results_dir / "latest"
+        try:
+            # Already pointing at this run — skip the unlink/recreate
+            # round trip (metadata ops can stall on network filesystems)
+            if os.readlink(latest) == run_dir.name:
+                print(f"  results written to {run_dir}")
+                return
+        except OSError:
+            pass
+        # Build the new link under a scratch name and rename it over the
+        # old one: a single atomic replace instead of the racy
+        # exists/unlink/symlink sequence, and readers never see a gap
+        tmp = results_dir / "latest.new"
+        try:
+            if tmp.is_symlink() or tmp.exists():
+                tmp.unlink()
+            os.symlink(run_dir.name, tmp)
+            os.replace(tmp, latest)
+        except OSError:
+            pass  # A broken pointer is not worth failing the save
+        print(f"  results written to {run_dir}")
+
+
+def run_suite(config=None, category=None, test_name=None):
+    """Run the suite in-process and return its summary dict.
+
+    Entry point for callers (like the variability tester) that want to
+    amortize interpreter startup and module imports across runs instead
+    of paying them per subprocess.
+    """
+    runner = TestRunner(config=config, save=False)
+    return runner.run_tests(category=category, test_name=test_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run agent scenario tests")
+    parser.add_argument("--category", help="Only run cases in this category")
+    parser.add_argument("--test", help="Only run the case with this id")
+    parser.add_argument("--config", default="config.json",
+                        help="JSON config file (relative to tests/)")
+    parser.add_argument("--no-save", action="store_true",
+                        help="Don't write a results directory")
+    parser.add_argument("--parallel", type=int, default=1, metavar="N",
+                        help="Run cases in N worker processes")
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="Stop at the first failing case and keep its "
+                             "scratch directory for inspection")
+    parser.add_argument("--json-summary-fd", type=int, metavar="FD",
+                        help="Write a one-line JSON summary to this fd "
+                             "(for parent processes collecting results)")
+    args = parser.parse_args()
+
+    runner = TestRunner(config=load_config(args.config), save=not args.no_save)
+    summary = runner.run_tests(category=args.category, test_name=args.test,
+                               parallel=args.parallel,
+                               fail_fast=args.fail_fast)
+
+    if runner.save:
+        runner.save_results(summary)
+
+    if args.json_summary_fd is not None:
+        # Machine-readable counts only; parents shouldn't scrape our stdout
+        payload = _dumps_bytes({"passed": summary["passed"],
+                                "failed": summary["failed"],
+                                "total": summary["total"]})
+        os.write(args.json_summary_fd, payload)
+        os.close(args.json_summary_fd)
+
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+"""
+Per-test variability analysis across repeated suite runs.
+
+Where parallel_variability_test.py fans out whole-suite subprocesses and
+only compares pass counts, this harness runs the suite in-process and
+follows every individual case across runs: which ones always pass, which
+always fail, and which flip between runs (the flaky set worth fixing).
+
+Runs are sequential by default. With --parallel N the independent runs
+are dispatched to a process pool instead; workers run quietly so their
+interleaved per-test output doesn't corrupt the report.
+
+Run with: python tests/variability_test.py [-n RUNS] [--parallel N]
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# Allow running from the repo root or the tests/ directory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from test_runner import TestRunner, _run_single, load_config
+
+# orjson for cache/result I/O; stdlib fallback. The indented variant is
+# only used for the human-inspected summary file.
+try:
+    from orjson import OPT_INDENT_2, dumps, loads as _json_loads
+
+    def _dumps_bytes(obj):
+        return dumps(obj)
+
+    def _dumps_indent(obj):
+        return dumps(obj, option=OPT_INDENT_2)
+except ImportError:
+    from json import loads as _json_loads
+
+    def _dumps_bytes(obj):
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+    def _dumps_indent(obj):
+        return json.dumps(obj, indent=2).encode()
+
+TESTS_DIR = Path(__file__).parent
+
+# Patterns are stored as ASCII P/F and translated to check marks only
+# when printed; the stored form keeps saved analyses compact
+_PATTERN_TR = str.maketrans({"P": "✓", "F": "✗"})
+
+# Bound method on the literal: one template parse, reused per row
+_ROW_FMT = "    {tid}: {pat} ({pct} pass)\n".format_map
+
+# A test is considered stable once this many consecutive runs agree;
+# later runs replay its cached result instead of re-executing it
+STABLE_AFTER = 3
+
+
+def _run_once(config, category, run_num, quiet=False):
+    """One full suite run; module-level so it pickles into worker processes."""
+    runner = TestRunner(config=config, save=False)
+    start_ns = time.perf_counter_ns()
+    if quiet:
+        # Workers swallow the per-test report; the parent prints summaries
+        with redirect_stdout(io.StringIO()):
+            summary = runner.run_tests(category=category)
+    else:
+        summary = runner.run_tests(category=category)
+    duration = (time.perf_counter_ns() - start_ns) / 1e9
+    return {
+        "run": run_num,
+        "duration_s": duration,
+        "passed": summary["passed"],
+        "failed": summary["failed"],
+        "total": summary["total"],
+        "results": summary["results"],
+    }
+
+
+class VariabilityTester:
+    """Runs the suite repeatedly and reports per-test stability."""
+
+    __test__ = False  # Framework class, not a pytest test
+
+    def __init__(self, num_runs=5, config_file="config.json", category=None,
+                 parallel=1, use_stable_cache=True, pretty=False, shards=1):
+        self.num_runs = num_runs
+        self.config = load_config(config_file)
+        self.category = category
+        self.parallel = parallel
+        self.use_stable_cache = use_stable_cache
+        self.pretty = pretty
+        # Cases within one sequential run fan out across this many worker
+        # processes; 0 sizes from the cores this process may actually use
+        if shards == 0:
+            shards = (len(os.sched_getaffinity(0))
+                      if hasattr(os, "sched_getaffinity")
+                      else os.cpu_count() or 1)
+        self.shards = shards
+        # Fingerprint of the runner config; a changed config invalidates
+        # every cached outcome, since it can change agent behavior
+        self._config_hash = hashlib.sha256(
+            json.dumps(self.config, sort_keys=True).encode()).hexdigest()
+        # {case-file sha256: status} for tests whose last STABLE_AFTER
+        # outcomes agreed; persisted across invocations
+        self._stable = self._load_stable_cache()
+        self._case_hashes = {}  # test id -> case-file sha256
+        self._history = {}      # test id -> recent statuses this session
+        self._runner = None     # shared across sequential runs; see below
+        self._cases = None      # parsed case list, loaded once per session
+
+    # -- stable-result cache ---------------------------------------------
+
+    def _stable_cache_path(self):
+        return TESTS_DIR / self.config["results_dir"] / "stable_cache.json"
+
+    def _load_stable_cache(self):
+        try:
+            data = _json_loads(self._stable_cache_path().read_bytes())
+        except (OSError, ValueError):
+            return {}
+        if data.get("config_hash") != self._config_hash:
+            return {}
+        return data.get("cases", {})
+
+    def _save_stable_cache(self):
+        path = self._stable_cache_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(_dumps_bytes({"config_hash": self._config_hash,
+                                  "cases": self._stable}))
+
+    def _hash_cases(self, runner):
+        """Map test id -> sha256 of its case file, computed once."""
+        if self._case_hashes:
+            return
+        cases_dir = TESTS_DIR / self.config["cases_dir"]
+        with os.scandir(cases_dir) as it:
+            for entry in it:
+                if not (entry.name.endswith(".json") and entry.is_file()):
+                    continue
+                raw = Path(entry.path).read_bytes()
+                case = runner.load_test_case(cases_dir / entry.name)
+                self._case_hashes[case["id"]] = hashlib.sha256(
+                    raw).hexdigest()
+
+    def _note_outcome(self, test_id, status):
+        """Track recent statuses; promote to stable after agreement."""
+        recent = self._history.setdefault(test_id, [])
+        recent.append(status)
+        if len(recent) > STABLE_AFTER:
+            del recent[0]
+        if (len(recent) == STABLE_AFTER
+                and all(s == status for s in recent)):
+            case_hash = self._case_hashes.get(test_id)
+            if case_hash:
+                self._stable[case_hash] = status
+
+    def _prepared_runner(self):
+        """One TestRunner shared by every sequential run.
+
+        Built on first use; its parsed-case cache, compiled validator
+        patterns and lazily-built agent then carry over between runs
+        instead of being reconstructed num_runs times.
+        """
+        if self._runner is None:
+            self._runner = TestRunner(config=self.config, save=False)
+            self._hash_cases(self._runner)
+            # Cases are scanned, parsed and filtered exactly once; every
+            # run iterates this same list (cases are read-only to runs)
+            self._cases = self._runner.load_test_cases(
+                category=self.category)
+        return self._runner
+
+    def _run_sequential(self, run_num):
+        """One sequential run; stable tests replay their cached result."""
+        runner = self._prepared_runner()
+        cases = self._cases
+
+        replayed = {}
+        to_run = []
+        for case in cases:
+            cached = (self._stable.get(
+                self._case_hashes.get(case["id"], ""))
+                if self.use_stable_cache else None)
+            if cached:
+                replayed[case["id"]] = {"id": case["id"],
+                                        "name": case.get("name", ""),
+                                        "status": cached, "cached": True}
+            else:
+                to_run.append(case)
+
+        executed = {}
+        start_ns = time.perf_counter_ns()
+        with redirect_stdout(io.StringIO()):
+            if self.shards > 1 and len(to_run) > 1:
+                # Cases are independent, so one run can itself fan out
+                # across shard workers (same per-case worker entry the
+                # runner's --parallel mode uses)
+                workers = min(self.shards, len(to_run))
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    futures = {
+                        executor.submit(_run_single, case, self.config):
+                            case["id"]
+                        for case in to_run
+                    }
+                    for future in as_completed(futures):
+                        executed[futures[future]] = future.result()
+            else:
+                for case in to_run:
+                    executed[case["id"]] = runner.run_case(case)
+        duration = (time.perf_counter_ns() - start_ns) / 1e9
+
+        passed = failed = 0
+        results = []
+        for case in cases:
+            result = replayed.get(case["id"]) or executed[case["id"]]
+            if "cached" not in result:
+                self._note_outcome(case["id"], result["status"])
+            results.append(result)
+            if result["status"] == "PASS":
+                passed += 1
+            else:
+                failed += 1
+        return {"run": run_num, "duration_s": duration, "passed": passed,
+                "failed": failed, "total": len(cases), "results": results}
+
+    def run_variability_tests(self):
+        """Execute all runs, analyze, report and save; returns the analysis."""
+        print(f"🔁 {self.num_runs} suite runs"
+              + (f", {self.parallel} workers" if self.parallel > 1 else "")
+              + "\n")
+        results_dir = TESTS_DIR / self.config["results_dir"]
+        run_dir = results_dir / f"variability_{datetime.now():%Y%m%d_%H%M%S}"
+        run_dir.mkdir(parents=True, exist_ok=True)
+
+        all_runs = []
+        if self.parallel > 1:
+            workers = min(self.parallel, self.num_runs, os.cpu_count() or 1)
+            # Warm the parent first — parsed cases, and crucially the
+            # agent build, whose lazy `import agent` pulls in the heavy
+            # smolagents/rich stack — then fork workers so they inherit
+            # all of it via copy-on-write instead of re-importing per
+            # process. Platforms without fork (Windows) fall back to the
+            # default start method and pay the per-worker import cost.
+            self._prepared_runner()._build_agent()
+            try:
+                ctx = multiprocessing.get_context("fork")
+            except ValueError:
+                ctx = None
+            # Runs share no state, so they fan out one per future; results
+            # are re-sorted by run number afterwards for a stable report
+            with ProcessPoolExecutor(max_workers=workers,
+                                     mp_context=ctx) as executor:
+                futures = [
+                    executor.submit(_run_once, self.config, self.category,
+                                    n, True)
+                    for n in range(1, self.num_runs + 1)
+                ]
+                for future in as_completed(futures):
+                    run = future.result()
+                    self._stream_run(run_dir, run)
+                    all_runs.append(run)
+                    print(f"  run {run['run']}: {run['passed']}/"
+                          f"{run['total']} passed ({run['duration_s']:.1f}s)")
+            all_runs.sort(key=lambda r: r["run"])
+        else:
+            # Stable-result caching needs the runs to happen in order, so
+            # it only applies on the sequential path
+            for n in range(1, self.num_runs + 1):
+                run = self._run_sequential(n)
+                self._stream_run(run_dir, run)
+                all_runs.append(run)
+                print(f"  run {n}: {run['passed']}/{run['total']} passed "
+                      f"({run['duration_s']:.1f}s)")
+            if self.use_stable_cache and self._stable:
+                self._save_stable_cache()
+
+        analysis = self._analyze_variability(all_runs)
+        self._generate_summary_report(all_runs, analysis, run_dir)
+        self._save_results(run_dir, all_runs, analysis)
+        return analysis
+
+    @staticmethod
+    def _stream_run(run_dir, run):
+        """Persist a run's full results, keep only id/name/status in RAM.
+
+        Full records (tool calls, answers, traces) go straight to a
+        per-run JSONL; the analysis only needs the status matrix, so
+        retaining whole payloads for every run would pin the entire
+        history in memory for nothing.
+        """
+        with open(run_dir / f"run_{run['run']}.jsonl", "wb") as f:
+            for result in run["results"]:
+                f.write(_dumps_bytes(result))
+                f.write(b"\n")
+        # Statuses arrive as fresh heap strings (JSON parses, subprocess
+        # results); interning them lets the analysis loop's == checks hit
+        # the pointer-identity fast path across tests x runs comparisons
+        run["results"] = [{"id": r["id"], "name": r.get("name", ""),
+                           "status": sys.intern(r["status"])}
+                          for r in run["results"]]
+
+    # Evaluated in order; first matching condition wins
+    _BUCKETS = ("always_pass", "always_fail", "mostly_pass", "inconsistent",
+                "mostly_fail")
+
+    def _analyze_variability(self, all_runs):
+        """Per-test status history and consistency buckets.
+
+        The counting runs on a boolean test×run matrix: one Python pass
+        fills it, then pass counts, rates and bucket labels come out of
+        numpy array ops instead of per-test interpreter loops.
+        """
+        num_runs = len(all_runs)
+        # Runs emit results in sorted case order, so first-seen order is
+        # already sorted; dict.fromkeys dedups in one pass without the
+        # set-then-sort round trip
+        test_ids = list(dict.fromkeys(
+            r["id"] for run in all_runs for r in run["results"]))
+        row = {test_id: i for i, test_id in enumerate(test_ids)}
+        names = {}
+        matrix = np.zeros((len(test_ids), num_runs), dtype=bool)
+        for j, run in enumerate(all_runs):
+            for result in run["results"]:
+                matrix[row[result["id"]], j] = result["status"] == "PASS"
+                names.setdefault(result["id"], result.get("name", ""))
+
+        passes = matrix.sum(axis=1)
+        rates = passes / num_runs
+        consistency = np.select(
+            [rates == 1.0, rates == 0.0, rates >= 0.7, rates >= 0.3],
+            ["always_pass", "always_fail", "mostly_pass", "inconsistent"],
+            default="mostly_fail")
+
+        # One bulk tolist() per array up front: the per-test loop then
+        # touches plain Python ints/bools/strs instead of boxing a numpy
+        # scalar on every element access
+        rows = matrix.tolist()
+        passes = passes.tolist()
+        rates = rates.tolist()
+        labels = consistency.tolist()
+
+        buckets = {bucket: [] for bucket in self._BUCKETS}
+        test_stats = {}
+        for i, test_id in enumerate(test_ids):
+            bucket = labels[i]
+            row = rows[i]
+            test_stats[test_id] = {
+                "name": names[test_id],
+                "statuses": ["PASS" if p else "FAIL" for p in row],
+                # Rendered once here; the report translates it per tier
+                "pattern_raw": "".join("P" if p else "F" for p in row),
+                "passes": passes[i],
+                "pass_rate": rates[i],
+                # Formatted once; the report tiers only concatenate it
+                "pass_rate_pct": f"{rates[i]:.0%}",
+                "consistency": bucket,
+            }
+            buckets[bucket].append(test_id)
+
+        # Run-level stats in one fused pass: sum, min, max and duration
+        # accumulate together, with one rate division per run
+        rate_sum = duration_sum = 0.0
+        rate_min = rate_max = None
+        for run in all_runs:
+            rate = run["passed"] / run["total"] if run["total"] else 0.0
+            rate_sum += rate
+            duration_sum += run["duration_s"]
+            if rate_min is None:
+                rate_min = rate_max = rate
+            elif rate < rate_min:
+                rate_min = rate
+            elif rate > rate_max:
+                rate_max = rate
+        overall_stats = {
+            "total_runs": num_runs,
+            "avg_pass_rate": rate_sum / num_runs if num_runs else 0.0,
+            "min_pass_rate": rate_min or 0.0,
+            "max_pass_rate": rate_max or 0.0,
+            "avg_duration_s": duration_sum / num_runs if num_runs else 0.0,
+        }
+
+        # The matrix stays local: test_stats already carries statuses and
+        # patterns per test, so returning it would just duplicate
+        # tests x runs worth of data into the saved analysis
+        return {"num_runs": num_runs, "test_stats": test_stats,
+                "buckets": buckets, "overall_stats": overall_stats}
+
+    def _generate_summary_report(self, all_runs, analysis, run_dir):
+        """Write summary.txt line by line, then echo it to the console.
+
+        Lines stream straight into the buffered file handle as they are
+        produced — no lines list and no joined mega-string held in
+        memory; the console copy is read back from disk afterwards.
+        """
+        test_stats = analysis["test_stats"]
+        buckets = analysis["buckets"]
+
+        path = run_dir / "summary.txt"
+        with open(path, "w", buffering=1 << 16) as f:
+            f.write(f"\n📊 variability across {analysis['num_runs']} runs, "
+                    f"{len(test_stats)} tests\n")
+            for bucket in self._BUCKETS:
+                f.write(f"  {bucket.replace('_', ' '):<13} "
+                        f"{len(buckets[bucket])}\n")
+
+            overall = analysis["overall_stats"]
+            f.write(f"\n  pass rate: {overall['avg_pass_rate']:.0%} avg "
+                    f"({overall['min_pass_rate']:.0%}–"
+                    f"{overall['max_pass_rate']:.0%}), "
+                    f"{overall['avg_duration_s']:.1f}s avg per run\n")
+
+            for bucket in ("inconsistent", "mostly_pass", "mostly_fail",
+                           "always_fail"):
+                if not buckets[bucket]:
+                    continue
+                f.write(f"\n  {bucket.replace('_', ' ')}:\n")
+                for test_id in buckets[bucket]:
+                    stats = test_stats[test_id]
+                    f.write(_ROW_FMT({
+                        "tid": test_id,
+                        "pat": stats["pattern_raw"].translate(_PATTERN_TR),
+                        "pct": stats["pass_rate_pct"],
+                    }))
+        sys.stdout.write(path.read_text())
+
+    def _save_results(self, run_dir, all_runs, analysis):
+        # Per-test payloads are already on disk as run_{n}.jsonl; the
+        # summary carries only run metadata and the analysis
+        record = {
+            "num_runs": self.num_runs,
+            "runs": [{k: run[k] for k in
+                      ("run", "duration_s", "passed", "failed", "total")}
+                     for run in all_runs],
+            "analysis": analysis,
+        }
+        # Machine-consumed, so compact by default: indentation roughly
+        # doubles both serialization time and on-disk size. --pretty adds
+        # an indented copy for eyeballing.
+        with open(run_dir / "full_results.json", "wb") as f:
+            f.write(_dumps_bytes(record))
+        if self.pretty:
+            with open(run_dir / "full_results.pretty.json", "wb") as f:
+                f.write(_dumps_indent(record))
+
+        # Dense per-test matrix for pandas/sqlite/grep consumers, who then
+        # never have to pick statuses out of the nested JSON
+        num_runs = analysis["num_runs"]
+        with open(run_dir / "matrix.csv", "w", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(["test_id", "name"]
+                            + [f"run_{n}" for n in range(1, num_runs + 1)]
+                            + ["passes", "pass_rate"])
+            for test_id, stats in analysis["test_stats"].items():
+                writer.writerow([test_id, stats["name"], *stats["statuses"],
+                                 stats["passes"],
+                                 f"{stats['pass_rate']:.3f}"])
+        print(f"\n  results written to {run_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Track per-test pass/fail stability across suite runs")
+    parser.add_argument("-n", "--runs", type=int, default=5)
+    parser.add_argument("--category", help="Only run cases in this category")
+    parser.add_argument("--config", default="config.json",
+                        help="JSON config file (relative to tests/)")
+    parser.add_argument("--parallel", type=int, default=1, metavar="N",
+                        help="Dispatch runs to N worker processes")
+    parser.add_argument("--no-stable-cache", action="store_true",
+                        help="Re-execute every test on every run instead of "
+                             "replaying results for consistently-stable ones")
+    parser.add_argument("--pretty", action="store_true",
+                        help="Also write an indented full_results.pretty.json")
+    parser.add_argument("--shards", type=int, default=1, metavar="K",
+                        help="Shard each run's cases across K worker "
+                             "processes (0 = one per available core)")
+    args = parser.parse_args()
+
+    tester = VariabilityTester(num_runs=args.runs, config_file=args.config,
+                               category=args.category, parallel=args.parallel,
+                               use_stable_cache=not args.no_stable_cache,
+                               pretty=args.pretty, shards=args.shards)
+    analysis = tester.run_variability_tests()
+    return 0 if not analysis["buckets"]["always_fail"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())